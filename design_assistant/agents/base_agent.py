@@ -8,41 +8,187 @@ handling, and context management.
 Extracted from design_assistant.py as part of the backend refactoring.
 """
 
-import json
+import os
+import re
+import hashlib
+import time
 import asyncio
-from datetime import datetime
+import logging
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional, AsyncIterable
 
 from livekit.agents.llm import ChatContext, function_tool, ChatMessage
 from livekit.agents.voice import Agent, RunContext
-from design_utils import load_prompt
+from design_utils import load_prompt, dumps_json, dumps_json_bytes
 
 # Define a generic type for the RunContext for cleaner type hinting
 from livekit.agents.voice import RunContext as RunContext_T
 
+logger = logging.getLogger(__name__)
+
+# Chat item types that make up a tool call and its result
+_FUNCTION_CALL_TYPES = frozenset({"function_call", "function_call_output"})
+
+# Backchannel acknowledgements that are not worth a transcript round-trip.
+# "yes" and "no" are left out: they answer the agents' questions.
+_FILLER_UTTERANCES = frozenset({
+    "ok", "okay", "thanks", "thank you", "uh huh", "mhm", "right", "sure",
+})
+
+# Generated replies keyed by context hash, evicted least-recently-used first
+_REPLY_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+_REPLY_CACHE_SIZE = 256
+
+# Transcript payloads published within this window share one data packet
+_PUBLISH_WINDOW_SECONDS = 0.015
+# Keep each coalesced packet under LiveKit's reliable data packet limit
+_MAX_BATCH_BYTES = 12_000
+_BATCH_PREFIX = b'{"type":"batch","msgs":['
+_BATCH_SUFFIX = b']}'
+
+# TTS receives whole sentences; a run-on buffer is flushed after this many words
+_SENTENCE_END = re.compile(r'[.?!]\s*$')
+_MAX_BUFFERED_WORDS = 80
+
+def _is_valid_message(item) -> bool:
+    return isinstance(item, ChatMessage) and item.content
+
+def _is_valid_item(item, keep_function_call: bool) -> bool:
+    """Check whether a chat item should survive _truncate_chat_ctx."""
+    if keep_function_call and getattr(item, 'type', None) in _FUNCTION_CALL_TYPES:
+        return True
+    return _is_valid_message(item)
+
+def _normalize_for_cache(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+@lru_cache(maxsize=32)
+def _from_block_json(identity: str, name: str) -> str:
+    """Serialize a transcript "from" block once per (identity, name) pair."""
+    return dumps_json({"identity": identity, "name": name})
+
+class _TranscriptPublisher:
+    """
+    Coalesces transcript payloads sent in quick succession into a single
+    data-channel publish. A lone payload is published as is; several are
+    wrapped as {"type": "batch", "msgs": [...]} for the frontend to unwrap.
+    """
+    def __init__(self, participant, topic: str = "lk-chat-topic"):
+        self._participant = participant
+        self._topic = topic
+        self._pending: list[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Flushes run as fire-and-forget tasks; keep them referenced until done
+        self._inflight: set[asyncio.Task] = set()
+        # asyncio.Lock is FIFO, so overlapping flushes still publish in order
+        self._publish_lock = asyncio.Lock()
+
+    def enqueue(self, json_message: str) -> None:
+        self._pending.append(json_message)
+        if self._flush_task is None:
+            task = asyncio.create_task(self._flush_after_window())
+            self._flush_task = task
+            self._inflight.add(task)
+            task.add_done_callback(self._on_flush_done)
+
+    def _on_flush_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to publish transcript batch: {task.exception()}")
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(_PUBLISH_WINDOW_SECONDS)
+        pending, self._pending = self._pending, []
+        self._flush_task = None
+
+        async with self._publish_lock:
+            await self._publish_pending(pending)
+
+    async def publish_in_order(self, payload: bytes) -> None:
+        """
+        Publish a payload in its own packet, after every transcript enqueued
+        before this call. Used for agent_state, so the frontend attributes an
+        outgoing agent's last line before it sees the handoff.
+        """
+        # Taken synchronously: anything enqueued from here on follows the payload
+        pending, self._pending = self._pending, []
+        async with self._publish_lock:
+            await self._publish_pending(pending)
+            await self._participant.publish_data(payload, topic=self._topic)
+
+    async def _publish_pending(self, pending: list[str]) -> None:
+        # Sizes are measured on the UTF-8 payload; non-ASCII text takes
+        # more bytes than characters
+        batch: list[bytes] = []
+        batch_bytes = len(_BATCH_PREFIX) + len(_BATCH_SUFFIX)
+        for message in pending:
+            data = message.encode()
+            if batch and batch_bytes + len(data) + 1 > _MAX_BATCH_BYTES:
+                await self._publish(batch)
+                batch, batch_bytes = [], len(_BATCH_PREFIX) + len(_BATCH_SUFFIX)
+            batch.append(data)
+            batch_bytes += len(data) + 1
+        if batch:
+            await self._publish(batch)
+
+    async def _publish(self, batch: list[bytes]) -> None:
+        if len(batch) == 1:
+            payload = batch[0]
+        else:
+            payload = _BATCH_PREFIX + b",".join(batch) + _BATCH_SUFFIX
+        await self._participant.publish_data(payload, topic=self._topic)
+
 class BaseAgent(Agent):
     '''Base class for all agents in the design workflow.'''
-    def __init__(self, *, instructions: str, name: str = None):
-        super().__init__(instructions=instructions)
+    _WELCOME_MESSAGE = "Welcome to the Design Assistant. I am your Design Coach. To begin, please tell me your first and last name."
+
+    def __init__(self, *, instructions: str, name: str = None, **agent_options):
+        # agent_options (e.g. llm=...) override the session's defaults for this agent
+        super().__init__(instructions=instructions, **agent_options)
         self._agent_name: str = self.__class__.__name__
         if name:
             self._agent_name = name
         
         # Convert class name to frontend format (e.g., DesignCoachAgent -> design_coach)
         self._frontend_identity = self._convert_class_name_to_identity(self._agent_name)
+        self._from_json = self._build_from_json()
+
+        # Weak reference to the owning DesignSession, set by DesignSession.initialize
+        self._design_session_ref: Optional[weakref.ref] = None
+
+        # Set SKIP_FILLER_TRANSCRIPTS=true to drop backchannel utterances from the transcript
+        self._skip_filler_transcripts = os.getenv("SKIP_FILLER_TRANSCRIPTS", "false").lower() == "true"
     
     def _convert_class_name_to_identity(self, class_name: str) -> str:
         """Convert class name like 'DesignCoachAgent' to 'design_coach'"""
         # Remove 'Agent' suffix and convert to snake_case
         name = class_name.replace('Agent', '')
         # Convert CamelCase to snake_case
-        import re
         snake_case = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
         snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', snake_case)
         return snake_case.lower()
 
     def _set_agent_name(self, name: str):
         self._agent_name = name
+        self._from_json = self._build_from_json()
+
+    def _build_from_json(self) -> str:
+        """Pre-serialize the agent's immutable "from" block for transcripts."""
+        return _from_block_json(
+            self._frontend_identity or "design_agent",
+            self._agent_name or "Design Agent",
+        )
+
+    @staticmethod
+    def _chat_message_json(text: str, is_final: bool, from_json: str) -> str:
+        """Build a chat message payload around an already serialized "from" block."""
+        timestamp = time.time_ns() // 1_000_000
+        return (
+            f'{{"message":{dumps_json(text)},"is_final":{"true" if is_final else "false"},'
+            f'"from":{from_json},"timestamp":{timestamp}}}'
+        )
 
     async def _llm_stream_to_str_stream(self, stream: AsyncIterable) -> AsyncIterable[str]:
         """Converts a stream of LLM ChatChunk objects to a stream of strings."""
@@ -50,13 +196,24 @@ class BaseAgent(Agent):
             if hasattr(chunk, 'delta') and hasattr(chunk.delta, 'content') and chunk.delta.content:
                 yield chunk.delta.content
 
+    async def _sentence_buffer(self, stream: AsyncIterable[str]) -> AsyncIterable[str]:
+        """Regroups a stream of text deltas into sentence-sized chunks for TTS."""
+        buffer = ""
+        async for chunk in stream:
+            buffer += chunk
+            if _SENTENCE_END.search(buffer) or len(buffer.split()) > _MAX_BUFFERED_WORDS:
+                yield buffer
+                buffer = ""
+        if buffer:
+            yield buffer
+
     async def on_enter(self) -> None:
         """Generic entry logic for agents."""
         if self.user_data.is_identified():
             return
         
         # This is the introductory message for new, unidentified users
-        await self.speak("Welcome to the Design Assistant. I am your Design Coach. To begin, please tell me your first and last name.")
+        await self.speak(self._WELCOME_MESSAGE)
 
     async def on_user_turn_completed(self, turn_ctx, new_message: ChatMessage) -> None:
         """
@@ -66,59 +223,149 @@ class BaseAgent(Agent):
         for the user's side of the conversation.
         """
         if new_message.content:
-            # The content can be a list of parts, we want to join them into a single string
-            transcript = "".join(str(part) for part in new_message.content)
+            # The content can be a list of parts, we want to join them into a single string.
+            # Plain text, alone or as a single part, needs no joining.
+            content = new_message.content
+            if isinstance(content, str):
+                transcript = content
+            elif len(content) == 1 and isinstance(content[0], str):
+                transcript = content[0]
+            else:
+                transcript = "".join(part if isinstance(part, str) else str(part) for part in content)
+            if self._skip_filler_transcripts and self._is_filler(transcript):
+                return
             await self.send_user_transcript(transcript, is_final=True)
 
-    async def speak(self, text_or_stream: str | AsyncIterable[str]):
+    @staticmethod
+    def _is_filler(transcript: str) -> bool:
+        """Check whether an utterance is a bare acknowledgement like "ok" or "thanks"."""
+        return transcript.strip().lower().rstrip(".!?,") in _FILLER_UTTERANCES
+
+    async def speak(self, text_or_stream: str | AsyncIterable[str], wait_for_playout: bool = True) -> str:
         """
         Speak the provided text via TTS and send the transcript over the data channel.
-        This function handles both simple strings and asynchronous streams of text.
+        This function handles both simple strings and asynchronous streams of text,
+        and returns the full text that was spoken.
+
+        For a string, wait_for_playout=False returns once the speech is queued and
+        its transcript sent, which lets a handoff proceed while the audio plays.
         """
         if isinstance(text_or_stream, str):
-            # Simple case: just a string
+            # Simple case: just a string. say() schedules TTS and returns a
+            # SpeechHandle, so the transcript goes out while audio is prepared.
+            speech_handle = self.user_data.agent_session.say(text_or_stream)
             await self._send_agent_transcript(text_or_stream, is_final=True)
-            await self.user_data.agent_session.say(text_or_stream)
+            if wait_for_playout:
+                await speech_handle
+            return text_or_stream
         else:
-            # Complex case: a stream of text chunks
-            full_text = ""
-            async def transcript_stream_iterator():
-                nonlocal full_text
-                async for chunk in self._llm_stream_to_str_stream(text_or_stream):
+            full_text, _ = await self._speak_stream(text_or_stream)
+            return full_text
+
+    async def _speak_stream(self, stream: AsyncIterable) -> tuple[str, bool]:
+        """
+        Speak an LLM stream. Transcript deltas go out per token, while TTS is
+        fed whole sentences.
+
+        Returns the text that was spoken and whether the reply was complete:
+        the stream was fully drained and playout was not interrupted. An error
+        raised by the stream is re-raised here once playout has stopped.
+        """
+        full_text = ""
+        drained = False
+        error: Optional[Exception] = None
+        async def transcript_stream_iterator():
+            nonlocal full_text, drained, error
+            try:
+                async for chunk in self._llm_stream_to_str_stream(stream):
                     full_text += chunk
                     await self._send_agent_transcript(chunk, is_final=False)
                     yield chunk
-                # Send the complete text as final message instead of empty string
-                if full_text.strip():
-                    await self._send_agent_transcript(full_text, is_final=True)
+            except Exception as e:
+                # The TTS task consuming this iterator would only log it
+                error = e
+                return
+            drained = True
+            # Send the complete text as final message instead of empty string
+            if full_text.strip():
+                await self._send_agent_transcript(full_text, is_final=True)
+
+        speech_handle = self.user_data.agent_session.say(
+            self._sentence_buffer(transcript_stream_iterator())
+        )
+        await speech_handle
+        if error is not None:
+            raise error
+        return full_text, drained and not speech_handle.interrupted
 
-            await self.user_data.agent_session.say(transcript_stream_iterator())
+    async def _speak_llm_reply(self, items: list, prefix: Optional[str] = None) -> tuple[str, bool]:
+        """
+        Generate a reply for the given chat items and speak it, optionally after
+        a fixed prefix. The LLM request is started before the prefix is spoken.
+
+        Returns the reply and whether it played out in full (False after a
+        barge-in). LLM errors and empty replies are raised; the prefix has been
+        spoken by then either way, so a fallback must not repeat it.
+
+        Replies are cached on the agent name and the role/content of every item,
+        so an identical context is spoken from the cache without an LLM call.
+        Only replies that played out in full are cached; a barge-in leaves a
+        partial reply that must not be replayed.
+        """
+        key = self._reply_cache_key(items)
+        cached = _REPLY_CACHE.get(key)
+        try:
+            if cached is None:
+                stream = await self.user_data.agent_session.llm.chat(chat_ctx=ChatContext(items))
+        finally:
+            if prefix:
+                await self.speak(prefix)
+
+        if cached is not None:
+            _REPLY_CACHE.move_to_end(key)
+            return await self.speak(cached), True
+
+        reply, complete = await self._speak_stream(stream)
+        if complete and not reply.strip():
+            raise RuntimeError("LLM returned an empty reply")
+        if complete:
+            _REPLY_CACHE[key] = reply
+            if len(_REPLY_CACHE) > _REPLY_CACHE_SIZE:
+                _REPLY_CACHE.popitem(last=False)
+        return reply, complete
+
+    def _reply_cache_key(self, items: list) -> bytes:
+        """
+        Hash the agent name and the role/content of each chat item.
+
+        Content is case-folded and whitespace-collapsed first, so restatements
+        that differ only in capitalization or spacing share a cached reply.
+        """
+        parts = [self._agent_name]
+        for item in items:
+            content = item.content
+            if isinstance(content, str):
+                content = _normalize_for_cache(content)
+            else:
+                content = [_normalize_for_cache(str(part)) for part in content]
+            parts.append((item.role, content))
+        return hashlib.blake2b(dumps_json(parts).encode(), digest_size=16).digest()
 
     async def _send_agent_transcript(self, text: str, is_final: bool):
         """Sends the agent's speech over the data channel."""
         if not self.user_data.ctx or not self.user_data.ctx.room:
-            print("Warning: Agent has no active session or room, cannot send data.")
+            logger.warning("Agent has no active session or room, cannot send data.")
             return
 
         # Don't send empty messages
         if not text or text.strip() == "":
             return
 
-        chat_message = {
-            "message": text,
-            "is_final": is_final,
-            "from": {
-                "identity": self._frontend_identity or "design_agent",
-                "name": self._agent_name or "Design Agent",
-            },
-            "timestamp": int(datetime.now().timestamp() * 1000),
-        }
-        json_message = json.dumps(chat_message)
+        json_message = self._chat_message_json(text, is_final, self._from_json)
         
-        print(f"DEBUG: Sending agent transcript: {json_message}")
-        await self.user_data.ctx.room.local_participant.publish_data(
-            json_message, topic="lk-chat-topic"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending agent transcript: %s", json_message)
+        self._get_transcript_publisher().enqueue(json_message)
 
     def _truncate_chat_ctx(
         self,
@@ -130,28 +377,49 @@ class BaseAgent(Agent):
         if not items:
             return []
 
-        def _is_valid_message(item) -> bool:
-            return isinstance(item, ChatMessage) and item.content
-
-        # Separate system message if it exists
+        # Keep the system message aside without mutating the caller's list
         system_message = None
-        if keep_system_message and items and _is_valid_message(items[0]) and items[0].role == 'system':
-            system_message = items.pop(0)
-
-        # Filter for valid ChatMessage objects
-        messages = [item for item in items if _is_valid_message(item)]
-
-        # Get the last N messages
-        last_n_messages = messages[-keep_last_n_messages:]
+        start = 0
+        if keep_system_message and _is_valid_message(items[0]) and items[0].role == 'system':
+            system_message = items[0]
+            start = 1
+
+        # Walk back from the newest item only until N valid items are seen,
+        # so the head of a long history is never inspected
+        end = len(items)
+        cut = end
+        found = 0
+        while cut > start and found < keep_last_n_messages:
+            cut -= 1
+            if _is_valid_item(items[cut], keep_function_call):
+                found += 1
+
+        # Collect that tail in chronological order with one forward pass
+        last_n_messages = [
+            items[i] for i in range(cut, end) if _is_valid_item(items[i], keep_function_call)
+        ]
+
+        # A truncated history must not open on a call whose context was cut off
+        skip = 0
+        while skip < len(last_n_messages) and getattr(last_n_messages[skip], 'type', None) in _FUNCTION_CALL_TYPES:
+            skip += 1
+        if skip:
+            last_n_messages = last_n_messages[skip:]
 
         # Re-add the system message at the beginning
         if system_message:
-            last_n_messages.insert(0, system_message)
+            return [system_message, *last_n_messages]
         
         return last_n_messages
 
     async def _send_agent_state(self):
         """Send the current agent orchestration state to the frontend."""
+        # DesignSession owns the state and skips publishes that repeat the last one
+        design_session = self.get_design_session()
+        if design_session:
+            await design_session._send_agent_state()
+            return
+
         state_payload = {
             "type": "agent_state",
             "current_agent_name": self.user_data.current_agent_name,
@@ -160,7 +428,7 @@ class BaseAgent(Agent):
             "loop_counts": self.user_data.loop_counts,
         }
         await self.user_data.ctx.room.local_participant.publish_data(
-            json.dumps(state_payload), topic="lk-chat-topic"
+            dumps_json_bytes(state_payload), topic="lk-chat-topic"
         )
 
     def get_design_session(self):
@@ -168,8 +436,13 @@ class BaseAgent(Agent):
         Get the DesignSession instance for workflow management.
         This replaces the old _transfer_to_agent and request_next_step methods.
         """
-        # The DesignSession should be accessible through the user_data
-        # This is set up during session initialization
+        # DesignSession binds itself to each agent when it creates them
+        if self._design_session_ref is not None:
+            design_session = self._design_session_ref()
+            if design_session is not None:
+                return design_session
+
+        # Otherwise fall back to the reference kept on user_data
         if hasattr(self.user_data, 'design_session'):
             return self.user_data.design_session
         return None
@@ -205,54 +478,60 @@ class BaseAgent(Agent):
             return self.llm.chat_ctx
         return ChatContext()
 
+    def _get_transcript_publisher(self) -> _TranscriptPublisher:
+        """Get the session-wide transcript publisher, creating it on first use."""
+        publisher = self.user_data.transcript_publisher
+        if publisher is None:
+            publisher = _TranscriptPublisher(self.user_data.ctx.room.local_participant)
+            self.user_data.transcript_publisher = publisher
+        return publisher
+
+    def _find_user_participant(self):
+        """
+        Find the human participant by looking for a participant that is not an agent.
+        This is more robust than assuming the user is always remote.
+        """
+        room = self.user_data.ctx.room
+        # DesignSession precomputes this set (persona keys and agent names)
+        agent_identities = self.user_data.agent_identities
+        if not agent_identities:
+            agent_identities = set(self.user_data.personas.keys())
+            agent_identities.add(self._agent_name)  # Add current agent's name for good measure
+
+        for p in (*room.remote_participants.values(), room.local_participant):
+            if p.identity not in agent_identities:
+                return p
+        return None
+
     async def send_user_transcript(self, text: str, is_final: bool):
         """
         Send the user's transcribed text to all other participants in the room
         """
         if not self.user_data or not self.user_data.ctx or not self.user_data.ctx.room:
-            print("Warning: Cannot send user transcript, room not available.")
+            logger.warning("Cannot send user transcript, room not available.")
             return
 
-        # Find the human participant by looking for a participant that is not an agent.
-        # This is more robust than assuming the user is always remote.
-        user_participant = None
-        all_participants = list(self.user_data.ctx.room.remote_participants.values()) + [self.user_data.ctx.room.local_participant]
-        
-        agent_identities = set(self.user_data.personas.keys())
-        agent_identities.add(self._agent_name)  # Add current agent's name for good measure
-
-        print(f"DEBUG: All participants in room: {[p.identity for p in all_participants]}")
-        print(f"DEBUG: Known agent identities: {agent_identities}")
-
-        for p in all_participants:
-            if p.identity not in agent_identities:
-                user_participant = p
-                break
+        # The human participant rarely changes, so resolve it once and reuse it
+        # until the session clears the cache on a participant join/leave.
+        user_participant = self.user_data.user_participant
+        if user_participant is None:
+            user_participant = self._find_user_participant()
+            self.user_data.user_participant = user_participant
         
         if not user_participant:
-            print("FATAL: Could not find a human participant in the room to attribute transcript to.")
+            logger.error("Could not find a human participant in the room to attribute transcript to.")
             # As a last resort, use a generic identity, but this indicates a problem.
-            from_info = {"identity": "user", "name": "User"}
+            from_json = _from_block_json("user", "User")
         else:
-            from_info = {
-                "identity": user_participant.identity,
-                "name": user_participant.name or self.user_data.first_name or "User",
-            }
-
-        chat_message = {
-            "message": text,
-            "is_final": is_final,
-            "from": from_info,
-            "timestamp": int(datetime.now().timestamp() * 1000),
-        }
-        json_message = json.dumps(chat_message)
-        
-        print(f"DEBUG: Sending user transcript: {json_message}")
+            from_json = _from_block_json(
+                user_participant.identity,
+                user_participant.name or self.user_data.first_name or "User",
+            )
+
+        json_message = self._chat_message_json(text, is_final, from_json)
 
         # The agent (local participant) publishes the data for everyone to see.
-        await self.user_data.ctx.room.local_participant.publish_data(
-            json_message, topic="lk-chat-topic"
-        )
+        self._get_transcript_publisher().enqueue(json_message)
 
     @property
     def user_data(self):
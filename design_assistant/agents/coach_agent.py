@@ -7,6 +7,7 @@ their design challenge and captures initial requirements.
 Extracted from design_assistant.py as part of the backend refactoring.
 """
 
+import asyncio
 import logging
 from typing import Optional
 
@@ -20,11 +21,15 @@ from livekit.agents.voice import RunContext as RunContext_T
 
 logger = logging.getLogger(__name__)
 
+# Parsed once at import so the worker loads it before any job arrives
+_COACH_INSTRUCTIONS = load_prompt('design_coach.yaml')
+
 class DesignCoachAgent(BaseAgent):
     '''An agent that helps users articulate their design challenge.'''
-    def __init__(self) -> None:
+    def __init__(self, **agent_options) -> None:
         super().__init__(
-            instructions=load_prompt('design_coach.yaml'),
+            instructions=_COACH_INSTRUCTIONS,
+            **agent_options,
         )
         self._set_agent_name("design_coach")
 
@@ -66,7 +71,7 @@ class DesignCoachAgent(BaseAgent):
             return "User identified and greeted."
 
         except Exception as e:
-            print(f"Database error in identify_user: {e}")
+            logger.error(f"Database error in identify_user: {e}")
             response = f"I'm sorry, {first_name}. I encountered an error accessing my database. Let's proceed for now. Please describe your design challenge."
             await self.speak(response)
             return "Error identifying user, but proceeded with session."
@@ -97,24 +102,34 @@ class DesignCoachAgent(BaseAgent):
             await self.speak("I'm sorry, I don't have a session ID to load. Please select one first.")
             return self
 
-        await self.speak(f"Great. I will load session {session_id} for you now. One moment.")
-
         try:
             logger.info(f"Attempting to load state for session_id: {session_id}")
-            userdata.load_state(session_id)
+            async def load():
+                # Let a pending save land first so it can't overlap the load
+                await userdata.flush_pending_save()
+                await asyncio.to_thread(userdata.load_state, session_id)
+
+            # Fetch the session from the database while the announcement is being spoken
+            await asyncio.gather(
+                self.speak(f"Great. I will load session {session_id} for you now. One moment."),
+                load(),
+            )
             logger.info(f"Successfully loaded state for session_id: {session_id}. User is now: {userdata.first_name}")
 
-            # Greet the user by name and provide a summary
-            await self.speak(f"Welcome back, {userdata.first_name}. I've loaded your session. Here's a quick summary:")
-            await self.speak(userdata.summarize())
-
             # Handoff to the correct agent based on loaded state
             if userdata.status == "ready_for_evaluation":
-                await self.speak("It looks like we were ready for feedback. I'll transfer you to the Design Evaluator.")
-                return await self.request_next_step(context)
+                handoff = "It looks like we were ready for feedback. I'll transfer you to the Design Evaluator."
             else: # Default to strategist
-                await self.speak("Let's continue refining your solution. I'll transfer you to the Design Strategist.")
-                return await self.request_next_step(context)
+                handoff = "Let's continue refining your solution. I'll transfer you to the Design Strategist."
+
+            # Greet, summarize and hand off in a single utterance so TTS runs once;
+            # the transfer starts while it plays
+            await self.speak(
+                f"Welcome back, {userdata.first_name}. I've loaded your session. "
+                f"Here's a quick summary:\n{userdata.summarize()}\n{handoff}",
+                wait_for_playout=False,
+            )
+            return await self.request_next_step(context)
 
         except ValueError as e:
             logger.error(f"ValueError loading session {session_id}: {e}", exc_info=True)
@@ -137,7 +152,7 @@ class DesignCoachAgent(BaseAgent):
         self.user_data.design_challenge = design_challenge
         self.user_data.target_users = target_users
         self.user_data.emotional_goals = emotional_goals
-        self.user_data.save_state()
+        self.user_data.mark_dirty()
         
         response = "I've captured the details of your design challenge. To move forward, we can proceed to the next step in the design process. Please let me know when you're ready or if there's anything else you'd like to add or modify."
         await self.speak(response)
@@ -3,10 +3,12 @@ Design Evaluator Agent Module
 """
 
 import json
+import logging
+
 from livekit.agents.llm import function_tool
 from livekit.agents.voice import RunContext
 from .base_agent import BaseAgent
-from design_utils import load_prompt
+from design_utils import load_prompt, dumps_json, dumps_json_bytes, openai_client
 
 # Define a generic type for the RunContext for cleaner type hinting
 from livekit.agents.voice import RunContext as RunContext_T
@@ -14,13 +16,22 @@ from livekit.agents.voice import RunContext as RunContext_T
 # Import ClarityCapsule from the new user_data module
 from user_data import ClarityCapsule
 
+logger = logging.getLogger(__name__)
+
+_EVALUATOR_INSTRUCTIONS = load_prompt('design_evaluator.yaml')
+
+# Bulk history reviews go through the OpenAI Batch API, which trades a
+# turnaround of up to 24h for half the token price
+_BATCH_MODEL = "gpt-4o-mini"
+_BATCH_COMPLETION_WINDOW = "24h"
+
 class DesignEvaluatorAgent(BaseAgent):
     '''
     An agent responsible for evaluating solutions and providing structured feedback.
     '''
     def __init__(self) -> None:
         super().__init__(
-            instructions=load_prompt('design_evaluator.yaml'),
+            instructions=_EVALUATOR_INSTRUCTIONS,
         )
         self._set_agent_name("design_evaluator")
 
@@ -38,6 +49,114 @@ class DesignEvaluatorAgent(BaseAgent):
         self.user_data.feedback_history.append({"feedback": feedback})
         return "OK. I've noted that feedback. Please call request_next_step to conclude the session."
 
+    @function_tool
+    async def evaluate_history_async(self) -> str:
+        """
+        Queue an offline review of every design iteration in this session.
+        Use this when the user wants their whole iteration history evaluated
+        and does not need the results right away; call
+        check_history_evaluation in a later session to collect them.
+        """
+        iterations = self.user_data.design_iterations
+        if not iterations:
+            return "There are no design iterations to evaluate."
+
+        lines = []
+        for i, iteration in enumerate(iterations):
+            request = {
+                "custom_id": f"iteration-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": _BATCH_MODEL,
+                    "messages": [
+                        {"role": "system", "content": self.instructions},
+                        {"role": "user", "content": (
+                            "Evaluate this design iteration. List its strengths, risks and blind spots.\n"
+                            f"Problem statement: {iteration.get('problem_statement') or self.user_data.problem_statement}\n"
+                            f"Solution: {iteration.get('solution')}"
+                        )},
+                    ],
+                },
+            }
+            lines.append(dumps_json(request))
+
+        try:
+            client = openai_client()
+            batch_file = await client.files.create(
+                file=("history_evaluation.jsonl", "\n".join(lines).encode()),
+                purpose="batch",
+            )
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=_BATCH_COMPLETION_WINDOW,
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue history evaluation batch: {e}")
+            await self.speak("I couldn't queue the review of your design history right now.")
+            return "Failed to queue history evaluation."
+
+        self.user_data.feedback_history.append({"batch_id": batch.id, "status": "pending"})
+        self.user_data.mark_dirty()
+        await self.speak("I've queued a detailed review of all your design iterations. The results will be ready in a later session.")
+        return "History evaluation queued."
+
+    @function_tool
+    async def check_history_evaluation(self) -> str:
+        """
+        Collect the results of reviews queued with evaluate_history_async,
+        adding any completed ones to the feedback history.
+        """
+        client = openai_client()
+        # Entries loaded from the database wrap the payload in feedback_data
+        history = [entry.get("feedback_data", entry) for entry in self.user_data.feedback_history]
+        history = [data for data in history if isinstance(data, dict)]
+        # Pending markers stay in place; a batch counts as done once its results are stored
+        done_batches = {data.get("batch_id") for data in history if "feedback" in data}
+
+        collected = 0
+        pending = 0
+        for data in history:
+            if data.get("status") != "pending" or data.get("batch_id") in done_batches:
+                continue
+            try:
+                batch = await client.batches.retrieve(data["batch_id"])
+                if batch.status != "completed" or not batch.output_file_id:
+                    pending += 1
+                    continue
+                output = await client.files.content(batch.output_file_id)
+            except Exception as e:
+                logger.error(f"Failed to check history evaluation batch {data.get('batch_id')}: {e}")
+                pending += 1
+                continue
+
+            results = []
+            for line in output.text.splitlines():
+                try:
+                    result = json.loads(line)
+                    choices = (result.get("response") or {}).get("body", {}).get("choices") or []
+                    if choices:
+                        results.append({
+                            "feedback": choices[0]["message"]["content"],
+                            "batch_id": data["batch_id"],
+                            "custom_id": result.get("custom_id"),
+                        })
+                except (ValueError, AttributeError, KeyError, IndexError, TypeError) as e:
+                    logger.error(f"Skipping unreadable result in history evaluation batch {data['batch_id']}: {e}")
+
+            # Without any usable result the batch stays pending for the next check
+            if not results:
+                pending += 1
+                continue
+            self.user_data.feedback_history.extend(results)
+            done_batches.add(data["batch_id"])
+            collected += 1
+
+        if collected:
+            self.user_data.mark_dirty()
+        return f"Collected {collected} completed history evaluation(s); {pending} still pending."
+
     @function_tool
     async def request_design_revision(self, context: RunContext_T, context_message: str):
         """
@@ -74,7 +193,7 @@ class DesignEvaluatorAgent(BaseAgent):
         self.user_data.status = "evaluation_complete"
 
         # Save the final state to the database
-        self.user_data.save_state()
+        self.user_data.mark_dirty()
 
         # Send the capsule to the frontend
         capsule_data = {
@@ -86,7 +205,7 @@ class DesignEvaluatorAgent(BaseAgent):
             "next_steps": capsule.next_steps,
         }
         await self.user_data.ctx.room.local_participant.publish_data(
-            json.dumps(capsule_data), topic="lk-chat-topic"
+            dumps_json_bytes(capsule_data), topic="lk-chat-topic"
         )
 
         await self.speak("I've finished generating your Clarity Capsule. You should see it on your screen now. Thank you for using the Design Assistant!")
@@ -2,6 +2,9 @@
 Design Strategist Agent Module
 """
 
+import json
+import logging
+
 from livekit.agents.llm import function_tool, ChatContext, ChatMessage
 from livekit.agents.voice import RunContext
 from .base_agent import BaseAgent
@@ -10,13 +13,23 @@ from design_utils import load_prompt
 # Define a generic type for the RunContext for cleaner type hinting
 from livekit.agents.voice import RunContext as RunContext_T
 
+logger = logging.getLogger(__name__)
+
+_STRATEGIST_INSTRUCTIONS = load_prompt('design_strategist.yaml')
+
 class DesignStrategistAgent(BaseAgent):
     '''
     An agent that refines problem statements and proposes initial solutions.
     '''
+    _INTRO_PROMPT = (
+        "Based on the context, what should you say to the user right now? "
+        "If there's a problem statement, ask if they want to refine it or propose a solution. "
+        "If not, ask them to create one."
+    )
+
     def __init__(self) -> None:
         super().__init__(
-            instructions=load_prompt('design_strategist.yaml'),
+            instructions=_STRATEGIST_INSTRUCTIONS,
         )
         self._set_agent_name("design_strategist")
 
@@ -24,6 +37,10 @@ class DesignStrategistAgent(BaseAgent):
         """
         Provide a greeting and instructions upon entry.
         """
+        # A self-transfer keeps the intro already present in the history
+        if self.user_data.prev_agent is self:
+            return
+
         # Truncate context before the LLM call
         messages = []
         if hasattr(self.llm, 'chat_history') and hasattr(self.llm.chat_history, 'messages'):
@@ -36,17 +53,10 @@ class DesignStrategistAgent(BaseAgent):
         )
 
         # Create a temporary context for the introductory message that includes history
-        intro_prompt = ChatMessage(
-            role="user", 
-            content=["Based on the context, what should you say to the user right now? If there's a problem statement, ask if they want to refine it or propose a solution. If not, ask them to create one."]
-        )
+        intro_prompt = ChatMessage(role="user", content=[self._INTRO_PROMPT])
         
-        temp_ctx = ChatContext(truncated_messages + [intro_prompt])
-
-        # Generate the introductory message
-        # Access the llm via the agent_session on user_data
-        stream = await self.user_data.agent_session.llm.chat(chat_ctx=temp_ctx)
-        await self.speak(stream)
+        # Generate the introductory message (identical contexts reuse a cached reply)
+        await self._speak_llm_reply(truncated_messages + [intro_prompt])
 
     @function_tool
     async def refine_problem_statement(self, problem_statement: str) -> str:
@@ -65,28 +75,25 @@ class DesignStrategistAgent(BaseAgent):
 
         # Update user data
         userdata.problem_statement = problem_statement
-        userdata.save_state()
+        userdata.mark_dirty()
 
         # Prepare context for the LLM
-        chat_ctx = ChatContext([
+        items = [
             ChatMessage(role="system", content=self.instructions),
             ChatMessage(role="user", content=f"The user has provided the following problem statement: '{problem_statement}'. What is a good follow-up question to ask them?")
-        ])
+        ]
         
-        # Generate the follow-up question
+        # Generate the follow-up question, spoken as it streams
         try:
-            stream = await self.user_data.agent_session.llm.chat(chat_ctx=chat_ctx)
-            str_stream = self._llm_stream_to_str_stream(stream)
-            response_text = ""
-            async for chunk in str_stream:
-                response_text += chunk
-
-            await self.speak(f"Problem statement updated. {response_text}")
-            return "Problem statement refined and follow-up question asked."
+            _, complete = await self._speak_llm_reply(items, prefix="Problem statement updated.")
         except Exception as e:
-            print(f"LLM Error in refine_problem_statement: {e}")
-            await self.speak("Problem statement updated. Now, what's the first step we should take to solve this?")
+            logger.error(f"LLM Error in refine_problem_statement: {e}")
+            # The prefix has already been spoken
+            await self.speak("Now, what's the first step we should take to solve this?")
             return "Problem statement refined."
+        if not complete:
+            return "Problem statement refined; the user interrupted the follow-up question."
+        return "Problem statement refined and follow-up question asked."
 
     @function_tool
     async def propose_solution(self, solution_description: str, key_features: list[str], context: RunContext_T):
@@ -95,5 +102,81 @@ class DesignStrategistAgent(BaseAgent):
         self.user_data.design_iterations.append(
             {"solution": solution_description, "features": key_features}
         )
-        await self.speak("That's a great starting point. I've noted that down.")
-        return await self.request_next_step(context) 
\ No newline at end of file
+        # Hand off while the acknowledgement is still playing
+        await self.speak("That's a great starting point. I've noted that down.", wait_for_playout=False)
+        return await self.request_next_step(context) 
+
+    @function_tool
+    async def propose_solutions_batch(self, solutions: list[str]) -> str:
+        """
+        Critique several candidate solutions in a single pass and record them all.
+        Use this instead of repeated propose_solution calls when the user wants to
+        compare alternatives.
+        """
+        if not solutions:
+            return "No candidate solutions provided."
+
+        userdata = self.user_data
+        # Iterations are stored against a problem statement; fall back to the challenge
+        problem = userdata.problem_statement or userdata.design_challenge
+        if not problem:
+            await self.speak("Let's define the design challenge before comparing solutions.")
+            return "No design challenge or problem statement yet."
+        # Numbered from 1, matching how the options are announced to the user
+        candidates = "\n".join(f"{i}. {solution}" for i, solution in enumerate(solutions, start=1))
+
+        # One request carries the instructions and problem once for all candidates
+        items = [
+            ChatMessage(role="system", content=self.instructions),
+            ChatMessage(role="user", content=(
+                f"Problem statement: '{problem}'.\n"
+                f"Candidate solutions:\n{candidates}\n"
+                "Critique each candidate. Reply with only a JSON array containing one object "
+                'per candidate: {"idx": <candidate number>, "critique": <string>, "score": <1-10>}.'
+            )),
+        ]
+        try:
+            stream = await userdata.agent_session.llm.chat(chat_ctx=ChatContext(items))
+            reply = "".join([chunk async for chunk in self._llm_stream_to_str_stream(stream)])
+            results = json.loads(reply[reply.index("["):reply.rindex("]") + 1])
+            if not isinstance(results, list):
+                raise ValueError(f"expected a JSON array, got {type(results).__name__}")
+        except Exception as e:
+            logger.error(f"LLM Error in propose_solutions_batch: {e}")
+            await self.speak("I couldn't compare those options right now. Let's look at them one at a time.")
+            return "Batch evaluation failed."
+
+        # LLMs often return numbers as strings ("1", "7"), so coerce them;
+        # idx is 1-based in the prompt and 0-based here
+        by_idx = {}
+        for result in results:
+            if not isinstance(result, dict):
+                continue
+            try:
+                by_idx[int(result.get("idx")) - 1] = result
+            except (TypeError, ValueError):
+                continue
+
+        for i, solution in enumerate(solutions):
+            result = by_idx.get(i, {})
+            userdata.design_iterations.append({
+                "problem_statement": problem,
+                "solution": solution,
+                "critique": result.get("critique"),
+                "score": result.get("score"),
+            })
+        userdata.mark_dirty()
+
+        def _score(i: int) -> float:
+            try:
+                return float(by_idx.get(i, {}).get("score"))
+            except (TypeError, ValueError):
+                return 0
+
+        best = max(range(len(solutions)), key=_score)
+        critique = by_idx.get(best, {}).get("critique") or ""
+        await self.speak(
+            f"I've compared all {len(solutions)} options. The strongest looks like option {best + 1}: "
+            f"{solutions[best]}. {critique}"
+        )
+        return "Candidate solutions evaluated and recorded."
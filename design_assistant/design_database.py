@@ -32,7 +32,8 @@ from supabase import create_client, Client
 from supabase._sync.client import SupabaseException
 from postgrest.exceptions import APIError
 import json
-from dataclasses import asdict, fields
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
 
 if TYPE_CHECKING:
     from user_data import UserData, ClarityCapsule
@@ -40,6 +41,25 @@ if TYPE_CHECKING:
 logger = logging.getLogger("design-assistant-db")
 logger.setLevel(logging.INFO)
 
+# Number of (first_name, last_name) -> user_id lookups kept per client
+_USER_ID_CACHE_SIZE = 1024
+
+@dataclass(frozen=True)
+class SaveResult:
+    '''
+    What write_user_data stored, to be applied back to the saved UserData.
+
+    Attributes:
+        session_id (str): The ID of the saved or updated session.
+        user_id (str): The ID of the session's user.
+        iteration_ids (Dict[int, str]): Position in design_iterations -> ID of the row inserted for it.
+        feedback_ids (Dict[int, str]): Position in feedback_history -> ID of the row inserted for it.
+    '''
+    session_id: str
+    user_id: str
+    iteration_ids: Dict[int, str]
+    feedback_ids: Dict[int, str]
+
 class DesignDatabase:
     """
     Database interface for the Design Assistant application.
@@ -76,6 +96,15 @@ class DesignDatabase:
         except SupabaseException as e:
             raise ValueError(f"Failed to connect to Supabase: {str(e)}")
 
+        # User ids never change once created, so resolved names are kept in an LRU
+        self._user_ids: "OrderedDict[tuple[str, str], str]" = OrderedDict()
+        # Row ids of the iterations and feedback stored per session. Entries in
+        # UserData carry the id of their row once written, so a save only inserts
+        # entries whose row isn't known to exist. Seeded on a session's first
+        # save or load, and dropped on load and cleanup.
+        self._saved_iterations: Dict[str, set] = {}
+        self._saved_feedback: Dict[str, set] = {}
+
     def _validate_uuid(self, uuid_str: str) -> None:
         """Validate UUID format."""
         try:
@@ -103,9 +132,21 @@ class DesignDatabase:
             
         Raises:
             ValueError: If first_name or last_name is empty
+
+        Note:
+            Names resolved by this instance are answered from memory afterwards,
+            which spares save_user_data a round trip on every save. If creating
+            a session rejects a remembered id (its user row was deleted),
+            save_user_data drops it and resolves the user again.
         """
         if not first_name or not last_name:
             raise ValueError("First name and last name are required")
+
+        key = (first_name, last_name)
+        user_id = self._user_ids.get(key)
+        if user_id is not None:
+            self._user_ids.move_to_end(key)
+            return user_id, False
             
         try:
             # Check if user exists
@@ -118,6 +159,7 @@ class DesignDatabase:
             if response.data:
                 user_id = response.data[0]['id']
                 logger.info(f"Found existing user: {first_name} {last_name} (ID: {user_id})")
+                self._remember_user_id(key, user_id)
                 return user_id, False
                 
             # Create new user
@@ -130,10 +172,17 @@ class DesignDatabase:
                 
             user_id = response.data[0]['id']
             logger.info(f"Created new user: {first_name} {last_name} (ID: {user_id})")
+            self._remember_user_id(key, user_id)
             return user_id, True
         except APIError as e:
             raise ValueError(f"Failed to get or create user: {str(e)}")
 
+    def _remember_user_id(self, key: tuple[str, str], user_id: str) -> None:
+        """Record a resolved user id, evicting the least recently used entry."""
+        self._user_ids[key] = user_id
+        if len(self._user_ids) > _USER_ID_CACHE_SIZE:
+            self._user_ids.popitem(last=False)
+
     def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Retrieves a user from the database by their ID."""
         self._validate_uuid(user_id)
@@ -248,6 +297,47 @@ class DesignDatabase:
         except APIError as e:
             raise ValueError(f"Failed to add design iteration: {str(e)}")
 
+    def add_design_iterations(self, session_id: str, iterations: List[tuple[str, str]]) -> List[str]:
+        """
+        Add several design iterations to a session in a single insert.
+        
+        Args:
+            session_id (str): The ID of the session
+            iterations (List[tuple[str, str]]): (problem_statement, solution) pairs
+            
+        Returns:
+            List[str]: The IDs of the new iterations, in input order
+            
+        Raises:
+            ValueError: If any iteration is missing a field or the insert fails
+        """
+        self._validate_uuid(session_id)
+        for problem_statement, solution in iterations:
+            self._validate_required_fields({
+                'problem_statement': problem_statement,
+                'solution': solution
+            }, ['problem_statement', 'solution'])
+        if not iterations:
+            return []
+        
+        try:
+            response = self.client.table('design_iterations') \
+                .insert([
+                    {
+                        'session_id': session_id,
+                        'problem_statement': problem_statement,
+                        'solution': solution
+                    }
+                    for problem_statement, solution in iterations
+                ]) \
+                .execute()
+                
+            iteration_ids = [row['id'] for row in response.data]
+            logger.info(f"Added {len(iteration_ids)} design iterations to session ID: {session_id}")
+            return iteration_ids
+        except APIError as e:
+            raise ValueError(f"Failed to add design iterations: {str(e)}")
+
     def add_feedback(self, session_id: str, feedback_data: Dict[str, Any]) -> str:
         """
         Add feedback to a design session.
@@ -280,6 +370,40 @@ class DesignDatabase:
         except APIError as e:
             raise ValueError(f"Failed to add feedback: {str(e)}")
 
+    def add_feedback_entries(self, session_id: str, feedback_entries: List[Dict[str, Any]]) -> List[str]:
+        """
+        Add several feedback entries to a session in a single insert.
+        
+        Args:
+            session_id (str): The ID of the session
+            feedback_entries (List[Dict[str, Any]]): The feedback data for each entry
+            
+        Returns:
+            List[str]: The IDs of the new feedback entries, in input order
+            
+        Raises:
+            ValueError: If session_id is invalid, an entry is empty, or the insert fails
+        """
+        self._validate_uuid(session_id)
+        if any(not feedback_data for feedback_data in feedback_entries):
+            raise ValueError("Feedback data cannot be empty")
+        if not feedback_entries:
+            return []
+        
+        try:
+            response = self.client.table('feedback_history') \
+                .insert([
+                    {'session_id': session_id, 'feedback_data': feedback_data}
+                    for feedback_data in feedback_entries
+                ]) \
+                .execute()
+                
+            feedback_ids = [row['id'] for row in response.data]
+            logger.info(f"Added {len(feedback_ids)} feedback entries to session ID: {session_id}")
+            return feedback_ids
+        except APIError as e:
+            raise ValueError(f"Failed to add feedback entries: {str(e)}")
+
     def get_user_sessions(self, user_id: str) -> List[Dict[str, Any]]:
         """
         Get all design sessions for a user.
@@ -363,6 +487,8 @@ class DesignDatabase:
         This method orchestrates the saving of the user, their design session,
         and all related iterations and feedback. It will either create a new
         session or update an existing one based on the design challenge.
+        The user ID and the IDs of newly inserted rows are then applied to
+        user_data.
 
         Args:
             user_data (UserData): The UserData instance containing the state to save.
@@ -370,6 +496,28 @@ class DesignDatabase:
         Returns:
             str: The session ID of the saved or updated session.
 
+        Raises:
+            ValueError: If required data is missing or a database error occurs.
+        """
+        result = self.write_user_data(user_data)
+        user_data.apply_save_result(result)
+        return result.session_id
+
+    def write_user_data(self, user_data: "UserData") -> SaveResult:
+        """
+        Write the state of a UserData instance to the database without
+        modifying it; the IDs to apply back are returned instead.
+
+        Entries of design_iterations and feedback_history that carry the ID of
+        a row known to exist are skipped; the rest are inserted.
+
+        Args:
+            user_data (UserData): The state to save. Only read, so it may be a
+                                  snapshot written from another thread.
+
+        Returns:
+            SaveResult: The session and user IDs, and the new row IDs by entry position.
+
         Raises:
             ValueError: If required data is missing or a database error occurs.
         """
@@ -384,13 +532,14 @@ class DesignDatabase:
              raise ValueError("Design challenge is required to save a session.")
 
         try:
-            # Step 1: Get or create the user and update the user_data object
-            user_id, is_new_user = self.get_or_create_user(user_data.first_name, user_data.last_name)
-            user_data.user_id = user_id
+            # Step 1: Get or create the user
+            user_key = (user_data.first_name, user_data.last_name)
+            user_id_was_cached = user_key in self._user_ids
+            user_id, is_new_user = self.get_or_create_user(*user_key)
             
             # Step 2: Check if a session for this user and challenge already exists
             session_id = None
-            if user_data.user_id:
+            if user_id:
                 existing_sessions = self.get_user_sessions(user_id)
                 for session in existing_sessions:
                     if session['design_challenge'] == user_data.design_challenge:
@@ -414,42 +563,109 @@ class DesignDatabase:
                     self.update_session(session_id, session_payload)
             else:
                 # Or, create a new session if one doesn't exist for this challenge
-                session_id = self.create_design_session(
-                    user_id=user_id,
-                    design_challenge=user_data.design_challenge,
-                    target_users=user_data.target_users or [],
-                    emotional_goals=user_data.emotional_goals or [],
-                    status=user_data.status
-                )
+                try:
+                    session_id = self._create_session_for(user_id, user_data)
+                except ValueError:
+                    # A remembered user id goes stale once its row is deleted, e.g.
+                    # by a cleanup in another process; resolve the user again and retry
+                    if not user_id_was_cached:
+                        raise
+                    logger.warning(f"Cached user ID {user_id} was rejected; looking the user up again")
+                    self._user_ids.pop(user_key, None)
+                    user_id, is_new_user = self.get_or_create_user(*user_key)
+                    session_id = self._create_session_for(user_id, user_data)
                 # After creation, update it with any additional data that may already exist
                 if session_payload:
                     self.update_session(session_id, session_payload)
             
             # Step 5: Save iterations and feedback, avoiding duplicates
+            iteration_ids: Dict[int, str] = {}
+            feedback_ids: Dict[int, str] = {}
             if session_id:
-                existing_iterations_res = self.client.table('design_iterations').select('problem_statement,solution').eq('session_id', session_id).execute()
-                existing_iterations = [(i['problem_statement'], i['solution']) for i in existing_iterations_res.data]
-
-                for iteration in user_data.design_iterations:
-                    if 'problem_statement' in iteration and 'solution' in iteration:
-                        if (iteration['problem_statement'], iteration['solution']) not in existing_iterations:
-                            self.add_design_iteration(session_id, iteration['problem_statement'], iteration['solution'])
-
-                existing_feedback_res = self.client.table('feedback_history').select('feedback_data').eq('session_id', session_id).execute()
-                existing_feedback = [f['feedback_data'] for f in existing_feedback_res.data]
-
-                for feedback in user_data.feedback_history:
-                    if feedback not in existing_feedback:
-                        self.add_feedback(session_id, feedback)
+                saved_iterations = self._saved_iterations.get(session_id)
+                if saved_iterations is None:
+                    saved_iterations_res = self.client.table('design_iterations').select('id').eq('session_id', session_id).execute()
+                    saved_iterations = {row['id'] for row in saved_iterations_res.data}
+                    self._saved_iterations[session_id] = saved_iterations
+
+                # New rows are gathered first and written with one insert per table;
+                # the ids they get are reported back by entry position
+                new_iterations = [
+                    (index, iteration) for index, iteration in enumerate(user_data.design_iterations)
+                    if 'problem_statement' in iteration and 'solution' in iteration
+                    and iteration.get('id') not in saved_iterations
+                ]
+                if new_iterations:
+                    new_ids = self.add_design_iterations(session_id, [
+                        (iteration['problem_statement'], iteration['solution']) for _, iteration in new_iterations
+                    ])
+                    iteration_ids = {index: row_id for (index, _), row_id in zip(new_iterations, new_ids)}
+                    saved_iterations.update(new_ids)
+
+                saved_feedback = self._saved_feedback.get(session_id)
+                if saved_feedback is None:
+                    saved_feedback_res = self.client.table('feedback_history').select('id').eq('session_id', session_id).execute()
+                    saved_feedback = {row['id'] for row in saved_feedback_res.data}
+                    self._saved_feedback[session_id] = saved_feedback
+
+                new_feedback = [
+                    (index, feedback) for index, feedback in enumerate(user_data.feedback_history)
+                    if feedback.get('id') not in saved_feedback
+                ]
+                if new_feedback:
+                    new_ids = self.add_feedback_entries(
+                        session_id, [self._feedback_payload(feedback) for _, feedback in new_feedback]
+                    )
+                    feedback_ids = {index: row_id for (index, _), row_id in zip(new_feedback, new_ids)}
+                    saved_feedback.update(new_ids)
             
-            return session_id
+            return SaveResult(session_id, user_id, iteration_ids, feedback_ids)
         except APIError as e:
             logger.error(f"A Supabase API error occurred: {e.message}")
             raise ValueError(f"Failed to save user data due to a database error: {e.message}")
         except Exception as e:
-            logger.error(f"An unexpected error occurred in save_user_data: {e}")
+            logger.error(f"An unexpected error occurred in write_user_data: {e}")
             raise
 
+    @staticmethod
+    def _feedback_payload(feedback: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the feedback_data to insert for a feedback_history entry.
+
+        Entries loaded by load_user_data are whole rows wrapping the payload in
+        feedback_data; entries added during a session are the payload itself,
+        plus the row id once stored.
+        """
+        if 'feedback_data' in feedback:
+            return feedback['feedback_data']
+        return {key: value for key, value in feedback.items() if key != 'id'}
+
+    def cleanup_all(self) -> None:
+        """
+        Empty every table with a single call to the cleanup_all() database
+        function, and forget the rows and users this instance has cached.
+
+        Only the service role may execute cleanup_all() (see setup_database).
+        """
+        try:
+            self.client.rpc('cleanup_all').execute()
+        except APIError as e:
+            raise ValueError(f"Failed to clean up database: {str(e)}")
+        self._user_ids.clear()
+        self._saved_iterations.clear()
+        self._saved_feedback.clear()
+        logger.info("Database cleanup completed successfully")
+
+    def _create_session_for(self, user_id: str, user_data: "UserData") -> str:
+        """Create the design session for user_data's challenge under user_id."""
+        return self.create_design_session(
+            user_id=user_id,
+            design_challenge=user_data.design_challenge,
+            target_users=user_data.target_users or [],
+            emotional_goals=user_data.emotional_goals or [],
+            status=user_data.status
+        )
+
     def load_user_data(self, session_id: str) -> "UserData":
         """
         Load all data for a given session_id from the database and reconstruct
@@ -509,6 +725,10 @@ class DesignDatabase:
             loaded_user_data.design_iterations = iterations
             loaded_user_data.feedback_history = feedback
 
+            # The rows just read are the session's stored state; reseed the caches
+            self._saved_iterations[session_id] = {row['id'] for row in iterations}
+            self._saved_feedback[session_id] = {row['id'] for row in feedback}
+
             # Reconstruct ClarityCapsule if present
             if session_data.get('clarity_capsule'):
                 capsule_data = session_data['clarity_capsule']
@@ -2,19 +2,87 @@
 Utility functions for the Design Assistant application.
 """
 
+import json
 import yaml
 import os
+from functools import lru_cache
 from typing import Dict, Any
 
+import httpx
+from openai import AsyncOpenAI
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Prefer the libyaml-backed loader; PyYAML builds without libyaml lack it
+_YamlSafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def dumps_json(obj: Any) -> str:
+    """
+    Serialize an object to a compact JSON string.
+
+    Uses orjson when it is installed and falls back to the standard library
+    otherwise, so data-channel payloads are encoded the same way either way.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+def dumps_json_bytes(obj: Any) -> bytes:
+    """
+    Serialize an object to compact UTF-8 JSON bytes.
+
+    publish_data accepts bytes, so whole payloads are handed over without a
+    decode/encode round trip when orjson is available.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+@lru_cache(maxsize=1)
+def openai_client() -> AsyncOpenAI:
+    """
+    Return the worker's shared OpenAI client.
+
+    The session LLM, the session TTS and the evaluator's Batch API calls all
+    go through this one client, so they reuse a single HTTP connection pool
+    instead of each opening their own TLS connections.
+
+    Settings match the client the livekit OpenAI plugins build by default:
+    no SDK retries, since livekit retries failed LLM and TTS requests itself,
+    and the plugins' timeouts and connection limits.
+    """
+    return AsyncOpenAI(
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=15.0, read=5.0, write=5.0, pool=5.0),
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=50,
+                max_keepalive_connections=50,
+                keepalive_expiry=120,
+            ),
+        ),
+    )
+
+@lru_cache(maxsize=None)
 def load_prompt(prompt_file: str) -> str:
     """
     Load an instruction prompt from a YAML file.
+
+    Results are cached per file, so each prompt is read and parsed once per
+    process no matter how many agents are constructed.
     
     Args:
         prompt_file (str): Path to the prompt file
         
     Returns:
-        str: The instruction string from the prompt file.
+        str: The instruction string from the prompt file. Prompts written as
+        structured sections (persona, rules, ...) without an `instructions` key
+        are rendered back to YAML text, minus the `tools` section, which the
+        agents' function tools already describe.
         
     Raises:
         FileNotFoundError: If the prompt file doesn't exist
@@ -22,5 +90,9 @@ def load_prompt(prompt_file: str) -> str:
     """
     prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', prompt_file)
     with open(prompt_path, 'r') as f:
-        prompt_data = yaml.safe_load(f)
-        return prompt_data.get('instructions', '') 
\ No newline at end of file
+        prompt_data = yaml.load(f, Loader=_YamlSafeLoader)
+    if 'instructions' in prompt_data:
+        return prompt_data['instructions']
+    # Render deterministically so the instructions form a stable, cacheable prefix
+    sections = {k: v for k, v in prompt_data.items() if k != 'tools'}
+    return yaml.safe_dump(sections, sort_keys=False, allow_unicode=True, width=1000) 
\ No newline at end of file
@@ -9,16 +9,26 @@ Refactored from design_assistant.py as part of the backend refactoring.
 
 import os
 import sys
+import asyncio
 import json
 import logging
 from dotenv import load_dotenv
 
-from livekit.agents import JobContext, WorkerOptions, WorkerType, cli, WorkerPermissions, JobRequest
+from livekit.agents import JobContext, JobProcess, WorkerOptions, WorkerType, cli, WorkerPermissions, JobRequest
 
 from user_data import UserData
-from session import DesignSession  
+from session import DesignSession, load_vad
+from design_utils import openai_client
 from design_database import DesignDatabase
 
+# Use libuv's event loop when available. Installed at import so the job
+# processes, which import this module before creating their loops, get it too.
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 # Load environment variables
 load_dotenv()
 
@@ -49,41 +59,66 @@ if missing_vars:
 
 async def entrypoint(ctx: JobContext):
     """Initialize and start the design assistant application in a worker."""
-    print(f"\\n=== WORKER AGENT JOB RECEIVED ===")
-    print(f"Joining room: {ctx.room.name}")
-
-    await ctx.connect()
-    print(f"Successfully connected to room: {ctx.room.name}")
-
-    print("--- DATABASE: Initializing DesignDatabase inside entrypoint ---")
-    db = DesignDatabase()
-    print("--- DATABASE: DesignDatabase initialized ---")
+    logger.info("Worker job received; joining room %s", ctx.room.name)
+
+    # Reuse the Supabase client built by prewarm; otherwise build it off the
+    # event loop while connecting to the room
+    db = ctx.proc.userdata.get("db")
+    if db is None:
+        logger.info("No prewarmed database client; initializing DesignDatabase")
+        _, db = await asyncio.gather(
+            ctx.connect(),
+            asyncio.to_thread(DesignDatabase),
+        )
+    else:
+        await ctx.connect()
+    logger.info("Connected to room %s", ctx.room.name)
 
     # Create user data with database connection
     user_data = UserData(ctx=ctx, db=db)
+    # Write out any save still pending from the last function tool call
+    ctx.add_shutdown_callback(user_data.flush_pending_save)
 
     # Create and initialize the design session
     session = DesignSession(user_data)
     await session.initialize()
     
-    print("--- SESSION: DesignSession initialized with all agents ---")
+    logger.info("DesignSession initialized")
 
     # Start the session with the initial agent (Coach)
     await session.start(ctx.room)
 
 
+def prewarm(proc: JobProcess):
+    """
+    Build the process's Supabase client, VAD model and OpenAI client while it
+    waits for a job, so the entrypoint only wires them together.
+    """
+    proc.userdata["db"] = DesignDatabase()
+    load_vad()
+    # Creating the client loads the TLS CA bundle; connections open on first use
+    openai_client()
+
+
+# Subcommands understood by livekit's cli.run_app
+_CLI_COMMANDS = frozenset({"connect", "console", "dev", "download-files", "start"})
+
+# Participant metadata marking the worker as an agent, serialized once
+_AGENT_METADATA = json.dumps({"is_agent": "true"})
+
 async def request_fnc(req: JobRequest):
     """Handle incoming job requests."""
-    print("Received job request", req)
+    # Accept first; logging waits until the acknowledgement is on its way
     await req.accept(
         identity="design_coach",
-        metadata=json.dumps({"is_agent": "true"})
+        metadata=_AGENT_METADATA,
     )
+    logger.debug("Accepted job request %s", req.id)
 
 
 def main():
     """Main application entry point."""
-    print("\n=== STARTING DESIGN ASSISTANT WORKER ===")
+    logger.info("Starting design assistant worker")
 
     permissions = WorkerPermissions(
         can_publish=True,
@@ -95,18 +130,13 @@ def main():
     worker_opts = WorkerOptions(
         request_fnc=request_fnc,
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         permissions=permissions,
         num_idle_processes=1,
     )
 
     # Add 'start' to the command-line arguments if no command is provided
-    if len(sys.argv) < 2 or sys.argv[1] not in [
-        "connect",
-        "console", 
-        "dev",
-        "download-files",
-        "start",
-    ]:
+    if len(sys.argv) < 2 or sys.argv[1] not in _CLI_COMMANDS:
         sys.argv.insert(1, "start")
 
     cli.run_app(worker_opts)
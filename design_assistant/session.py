@@ -9,6 +9,9 @@ Extracted from design_assistant.py as part of the backend refactoring.
 """
 
 import asyncio
+import logging
+import weakref
+from functools import lru_cache
 from typing import Optional
 
 from livekit.agents.voice import AgentSession, Agent, RunContext
@@ -16,12 +19,53 @@ from livekit.agents.llm import ChatMessage
 from livekit.plugins import deepgram, openai, silero
 
 from user_data import UserData
+from design_utils import dumps_json_bytes, openai_client
 from agents import (
     DesignCoachAgent,
     DesignStrategistAgent, 
     DesignEvaluatorAgent
 )
 
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def load_vad() -> silero.VAD:
+    """
+    Load the Silero VAD model once per worker process.
+
+    The loaded model holds only weights; each AgentSession opens its own
+    stream from it, so every session in the process can share one instance.
+    """
+    # A short silence window ends the user's turn sooner; AgentSession's own
+    # endpointing delay still applies on top before a reply is generated
+    return silero.VAD.load(min_silence_duration=0.4)
+
+# Agents the workflow can transfer to, keyed by the name used in orchestration state
+_AGENT_FACTORIES = {
+    "DesignCoachAgent": DesignCoachAgent,
+    "DesignStrategistAgent": DesignStrategistAgent,
+    "DesignEvaluatorAgent": DesignEvaluatorAgent,
+}
+
+# The coach only gathers names and challenge details through tool calls, so it
+# runs on a smaller, faster model; the other agents use the session LLM
+_COACH_MODEL = "gpt-4o-mini"
+
+# Linear workflow: current agent -> (next agent, user_data field, context template)
+_HANDOFFS = {
+    "DesignCoachAgent": (
+        "DesignStrategistAgent",
+        "design_challenge",
+        "The user has defined their design challenge as: '{value}'. Your task is to help them refine this into a 'How might we...' statement and then propose a solution.",
+    ),
+    "DesignStrategistAgent": (
+        "DesignEvaluatorAgent",
+        "proposed_solution",
+        "The user has proposed the following solution: {value}. Your task is to evaluate it.",
+    ),
+}
+_LOOP_BACK_TEMPLATE = "The user wants to revise the design. Here is their feedback: {reason}"
+
 class DesignSession:
     """
     Manages the design workflow session, including agent transitions and loop logic.
@@ -41,18 +85,27 @@ class DesignSession:
         self.livekit_session: Optional[AgentSession] = None
         self._agents: dict[str, Agent] = {}
         self._current_agent: Optional[Agent] = None
+        # Last orchestration state sent to the frontend, used to skip repeats
+        self._last_state_key: Optional[tuple] = None
+        # Fire-and-forget state publishes, referenced until they finish
+        self._state_tasks: set[asyncio.Task] = set()
         
     async def initialize(self):
         """
         Initialize the session with all required components.
-        This creates the LiveKit session and instantiates all agents.
+        This creates the LiveKit session and the initial Coach agent; the other
+        agents are instantiated on their first transfer.
         """
+        # LLM and TTS share one OpenAI client and its connection pool
+        client = openai_client()
+
         # Asynchronously initialize all plugins to avoid blocking the event loop
-        stt, llm, tts, vad = await asyncio.gather(
+        stt, llm, coach_llm, tts, vad = await asyncio.gather(
             asyncio.to_thread(deepgram.STT),
-            asyncio.to_thread(openai.LLM),
-            asyncio.to_thread(lambda: openai.TTS(voice="alloy")),
-            asyncio.to_thread(silero.VAD.load, min_silence_duration=1.2),
+            asyncio.to_thread(lambda: openai.LLM(client=client)),
+            asyncio.to_thread(lambda: openai.LLM(model=_COACH_MODEL, client=client)),
+            asyncio.to_thread(lambda: openai.TTS(voice="alloy", client=client)),
+            asyncio.to_thread(load_vad),
         )
 
         # Create the LiveKit AgentSession
@@ -70,25 +123,51 @@ class DesignSession:
         # Store reference to this DesignSession in user_data for agent access
         self.user_data.design_session = self
         
-        # Initialize all agents
-        self._agents = {
-            "DesignCoachAgent": DesignCoachAgent(),
-            "DesignStrategistAgent": DesignStrategistAgent(),
-            "DesignEvaluatorAgent": DesignEvaluatorAgent()
-        }
+        # Persona names count as agent identities even before the agent exists
+        self.user_data.agent_identities.update(_AGENT_FACTORIES)
+
+        # Only the Coach is needed up front; later agents are built on first transfer
+        coach = self._register_agent("DesignCoachAgent", DesignCoachAgent(llm=coach_llm))
         
         # Store agents in user_data for backward compatibility
         self.user_data.personas = self._agents
         
         # Set initial agent
-        self._current_agent = self._agents["DesignCoachAgent"]
+        self._current_agent = coach
+
+    def _register_agent(self, agent_name: str, agent: Agent) -> Agent:
+        """Bind an agent to this session and record its identities."""
+        # Tool calls reach the session through this weak reference
+        agent._design_session_ref = weakref.ref(self)
+        self._agents[agent_name] = agent
+        # Every identity an agent may use, for transcript attribution
+        self.user_data.agent_identities.update((agent_name, agent._agent_name))
+        return agent
+
+    def _get_agent(self, agent_name: str) -> Optional[Agent]:
+        """Get an agent by name, constructing it on first use."""
+        agent = self._agents.get(agent_name)
+        if agent is None:
+            factory = _AGENT_FACTORIES.get(agent_name)
+            if factory is None:
+                return None
+            agent = self._register_agent(agent_name, factory())
+        return agent
         
     async def start(self, room):
         """Start the session with the initial agent."""
         if not self.livekit_session:
             raise RuntimeError("Session not initialized. Call initialize() first.")
+
+        # Any change in room membership may change who the human participant is
+        room.on("participant_connected", self._invalidate_user_participant)
+        room.on("participant_disconnected", self._invalidate_user_participant)
             
         await self.livekit_session.start(agent=self._current_agent, room=room)
+
+    def _invalidate_user_participant(self, participant) -> None:
+        """Drop the cached human participant so the next transcript re-resolves it."""
+        self.user_data.user_participant = None
         
     def determine_next_agent(self, current_agent_name: str, context: Optional[str] = None) -> tuple[str, Optional[str]]:
         """
@@ -97,24 +176,14 @@ class DesignSession:
         Returns:
             tuple: (next_agent_name, context_message)
         """
-        context_message = None
-        
-        # Linear workflow logic
-        if current_agent_name == "DesignCoachAgent":
-            next_agent_name = "DesignStrategistAgent"
-            challenge = self.user_data.design_challenge
-            if challenge:
-                context_message = f"The user has defined their design challenge as: '{challenge}'. Your task is to help them refine this into a 'How might we...' statement and then propose a solution."
-                
-        elif current_agent_name == "DesignStrategistAgent":
-            next_agent_name = "DesignEvaluatorAgent"
-            solution = self.user_data.proposed_solution
-            if solution:
-                context_message = f"The user has proposed the following solution: {solution}. Your task is to evaluate it."
-                
-        else:
+        handoff = _HANDOFFS.get(current_agent_name)
+        if handoff is None:
             # End of flow case - stay on current agent
             return current_agent_name, "There are no further steps in this design flow."
+
+        next_agent_name, field_name, template = handoff
+        value = getattr(self.user_data, field_name)
+        context_message = template.format_map({"value": value}) if value else None
             
         return next_agent_name, context_message
         
@@ -129,7 +198,7 @@ class DesignSession:
         - Frontend state notifications
         """
         # Get the target agent
-        next_agent = self._agents.get(agent_name)
+        next_agent = self._get_agent(agent_name)
         if not next_agent:
             # Fallback - return current agent
             if self._current_agent:
@@ -148,18 +217,28 @@ class DesignSession:
             if hasattr(self.livekit_session.llm, 'chat_history'):
                 self.livekit_session.llm.chat_history.messages.append(sys_msg)
         
-        # Update orchestration state
-        self.user_data.current_agent_name = agent_name
-        self.user_data.agent_sequence.append(agent_name)
-        
-        # Update current agent
-        self._current_agent = next_agent
+        # Update orchestration state; re-entering the active agent doesn't
+        # extend the sequence (the state publish below dedupes a no-op)
+        if next_agent is not self._current_agent:
+            self.user_data.current_agent_name = agent_name
+            self.user_data.agent_sequence.append(agent_name)
+            self._current_agent = next_agent
         
-        # Send updated state to frontend
-        await self._send_agent_state()
+        # Publish the new state in the background so the next agent's on_enter
+        # can assemble its context while the data packet is in flight. The task
+        # starts before on_enter runs, so it claims the outgoing agent's pending
+        # transcripts and publishes them ahead of the state.
+        task = asyncio.create_task(self._send_agent_state())
+        self._state_tasks.add(task)
+        task.add_done_callback(self._on_state_task_done)
         
         return next_agent
         
+    def _on_state_task_done(self, task: asyncio.Task) -> None:
+        self._state_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to publish agent state: {task.exception()}")
+
     async def handle_agent_transition(self, context: RunContext) -> Agent:
         """
         Handle a request for agent transition using workflow logic.
@@ -188,15 +267,27 @@ class DesignSession:
         loop_counts = self.user_data.loop_counts
         loop_counts[target_agent_name] = loop_counts.get(target_agent_name, 0) + 1
         
-        context_message = f"The user wants to revise the design. Here is their feedback: {reason}"
+        context_message = _LOOP_BACK_TEMPLATE.format_map({"reason": reason})
         return await self.transition_to_agent(target_agent_name, context_message)
         
     async def _send_agent_state(self):
         """Send the current agent orchestration state to the frontend."""
         if not self.user_data.ctx or not self.user_data.ctx.room:
             return
+
+        # Skip the publish when nothing has changed since the last one
+        state_key = (
+            self.user_data.current_agent_name,
+            tuple(self.user_data.agent_sequence),
+            self.user_data.loop_reason,
+            tuple(sorted(self.user_data.loop_counts.items())),
+        )
+        if state_key == self._last_state_key:
+            return
+        # Claimed before the first await, so an overlapping publish of the same
+        # state is skipped and a slower earlier task can't overwrite a newer key
+        previous_key, self._last_state_key = self._last_state_key, state_key
             
-        import json
         state_payload = {
             "type": "agent_state",
             "current_agent_name": self.user_data.current_agent_name,
@@ -204,9 +295,23 @@ class DesignSession:
             "loop_reason": self.user_data.loop_reason,
             "loop_counts": self.user_data.loop_counts,
         }
-        await self.user_data.ctx.room.local_participant.publish_data(
-            json.dumps(state_payload), topic="lk-chat-topic"
-        )
+        payload = dumps_json_bytes(state_payload)
+        publisher = self.user_data.transcript_publisher
+        try:
+            if publisher is not None:
+                # Queue behind transcripts still in their batching window, so the
+                # outgoing agent's last line isn't attributed to the next agent
+                await publisher.publish_in_order(payload)
+            else:
+                await self.user_data.ctx.room.local_participant.publish_data(
+                    payload, topic="lk-chat-topic"
+                )
+        except Exception:
+            # Release the claim so the same state is retried, unless a newer
+            # state has been claimed in the meantime
+            if self._last_state_key == state_key:
+                self._last_state_key = previous_key
+            raise
         
     @property
     def current_agent(self) -> Optional[Agent]:
@@ -215,5 +320,5 @@ class DesignSession:
         
     @property
     def agents(self) -> dict[str, Agent]:
-        """Get all available agents."""
+        """Get all agents instantiated so far."""
         return self._agents.copy() 
\ No newline at end of file
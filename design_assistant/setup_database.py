@@ -1,8 +1,11 @@
 import os
+import sys
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import logging
 
+from design_database import DesignDatabase
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -116,6 +119,21 @@ def setup_database():
 
         CREATE POLICY "Allow all operations for authenticated users" ON feedback_history
             FOR ALL USING (true);
+        """,
+
+        # 6. Create a cleanup function that empties all tables in one call.
+        # Functions are executable by PUBLIC by default, which PostgREST exposes
+        # to the anon key; only the service role may call this one.
+        """
+        CREATE OR REPLACE FUNCTION cleanup_all()
+        RETURNS void AS $$
+        BEGIN
+            TRUNCATE feedback_history, design_iterations, design_sessions, users CASCADE;
+        END;
+        $$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+        REVOKE EXECUTE ON FUNCTION cleanup_all() FROM PUBLIC, anon, authenticated;
+        GRANT EXECUTE ON FUNCTION cleanup_all() TO service_role;
         """
     ]
 
@@ -131,5 +149,21 @@ def setup_database():
 
     logger.info("Database setup completed successfully")
 
+def cleanup_database():
+    """
+    Delete all rows from every table with a single round-trip.
+
+    Run with `python setup_database.py cleanup`. SUPABASE_KEY must be the
+    service role key, the only role allowed to execute cleanup_all().
+    """
+    load_dotenv()
+
+    # cleanup_all() truncates every table in one transaction (see setup_database);
+    # going through DesignDatabase also drops its cached rows and user ids
+    DesignDatabase().cleanup_all()
+
 if __name__ == "__main__":
-    setup_database() 
\ No newline at end of file
+    if sys.argv[1:] == ["cleanup"]:
+        cleanup_database()
+    else:
+        setup_database() 
\ No newline at end of file
@@ -43,6 +43,22 @@ class TestModularArchitecture:
         user_data.last_name = TEST_USER['last_name']
         assert user_data.is_identified()
 
+    def test_user_data_summary_cache_invalidation(self):
+        """Test that cached summaries refresh when a summarized field changes."""
+        user_data = UserData()
+        assert user_data.summarize() == "User not yet identified."
+
+        user_data.first_name = TEST_USER['first_name']
+        user_data.last_name = TEST_USER['last_name']
+        user_data.design_challenge = TEST_DESIGN_CHALLENGE['design_challenge']
+        summary = user_data.summarize()
+        assert summary.startswith("User: John Doe")
+        assert TEST_DESIGN_CHALLENGE['design_challenge'] in summary
+
+        user_data.reset()
+        assert not user_data.is_identified()
+        assert user_data.summarize() == "User not yet identified."
+
     def test_clarity_capsule_creation(self):
         """Test ClarityCapsule can be created."""
         capsule = ClarityCapsule(
@@ -78,6 +94,14 @@ class TestModularArchitecture:
         session.user_data.design_session = session
         assert user_data.design_session == session
 
+    def test_feedback_payload_unwraps_loaded_rows(self):
+        """Test that loaded feedback rows are re-saved as their payload, not nested."""
+        loaded_row = {"id": "row-1", "session_id": "s-1", "feedback_data": {"feedback": "Clear"}, "created_at": "now"}
+        added = {"feedback": "Clear", "id": "row-2"}
+
+        assert DesignDatabase._feedback_payload(loaded_row) == {"feedback": "Clear"}
+        assert DesignDatabase._feedback_payload(added) == {"feedback": "Clear"}
+
 class TestAgentFunctionality:
     """Test core agent functionality by testing the business logic directly."""
 
@@ -106,6 +130,59 @@ class TestAgentFunctionality:
         assert session_id == "test_session_id"
         mock_db.save_user_data.assert_called_once_with(user_data)
 
+    def test_load_state_keeps_runtime_fields(self):
+        """Test that load_state copies session data but keeps the live db handle."""
+        mock_db = MagicMock()
+        mock_db.load_user_data.return_value = UserData(
+            first_name=TEST_USER['first_name'],
+            design_challenge=TEST_DESIGN_CHALLENGE['design_challenge'],
+        )
+        user_data = UserData(db=mock_db)
+
+        user_data.load_state("test_session_id")
+
+        assert user_data.first_name == TEST_USER['first_name']
+        assert user_data.design_challenge == TEST_DESIGN_CHALLENGE['design_challenge']
+        assert user_data.db is mock_db
+
+    def test_mark_dirty_coalesces_saves(self):
+        """Test that back-to-back save requests reach the database once."""
+        import asyncio
+
+        mock_db = MagicMock()
+        user_data = UserData(db=mock_db)
+
+        async def request_saves():
+            user_data.mark_dirty()
+            user_data.mark_dirty()
+            user_data.mark_dirty()
+            await user_data.flush_pending_save()
+
+        asyncio.run(request_saves())
+        mock_db.write_user_data.assert_called_once()
+
+    def test_background_save_applies_ids_on_loop(self):
+        """Test that the writer gets a copy and the new row ids are applied to the live entries."""
+        import asyncio
+        from design_assistant.design_database import SaveResult
+
+        iteration = {"problem_statement": TEST_PROBLEM_STATEMENT, "solution": TEST_SOLUTION}
+        mock_db = MagicMock()
+        mock_db.write_user_data.return_value = SaveResult("session-1", "user-1", {0: "row-1"}, {})
+        user_data = UserData(db=mock_db, design_iterations=[iteration])
+
+        async def save():
+            user_data.mark_dirty()
+            await user_data.flush_pending_save()
+
+        asyncio.run(save())
+
+        snapshot = mock_db.write_user_data.call_args.args[0]
+        assert snapshot is not user_data
+        assert snapshot.design_iterations[0] is not iteration
+        assert iteration["id"] == "row-1"
+        assert user_data.user_id == "user-1"
+
     def test_agent_workflow_delegation(self):
         """Test that agents can delegate to DesignSession for workflow management."""
         # Create mock components
@@ -135,6 +212,293 @@ class TestAgentFunctionality:
             # Restore original property
             type(agent).user_data = original_user_data
 
+    def test_sentence_buffer_groups_deltas(self):
+        """Test that streamed deltas reach TTS as whole sentences."""
+        import asyncio
+
+        async def deltas():
+            for chunk in ["Hello", " there", ".", " How", " are", " you?", " Bye"]:
+                yield chunk
+
+        async def collect():
+            agent = DesignCoachAgent()
+            return [s async for s in agent._sentence_buffer(deltas())]
+
+        assert asyncio.run(collect()) == ["Hello there.", " How are you?", " Bye"]
+
+    def test_reply_cache_key_ignores_case_and_spacing(self):
+        """Test that restatements differing only in case or spacing share a cache key."""
+        from livekit.agents.llm import ChatMessage
+
+        agent = DesignStrategistAgent()
+        key = agent._reply_cache_key([ChatMessage(role="user", content=["Design a fitness app"])])
+        restated = agent._reply_cache_key([ChatMessage(role="user", content=["  design a   Fitness App"])])
+        other = agent._reply_cache_key([ChatMessage(role="user", content=["Design a banking app"])])
+
+        assert key == restated
+        assert key != other
+
+    def test_interrupted_reply_is_not_cached(self):
+        """Test that a reply cut off by a barge-in is not stored in the reply cache."""
+        import asyncio
+        from types import SimpleNamespace
+        from design_assistant.agents.base_agent import _REPLY_CACHE
+        from livekit.agents.llm import ChatMessage
+
+        async def llm_stream():
+            for text in ["First sentence.", " Second sentence."]:
+                yield SimpleNamespace(delta=SimpleNamespace(content=text))
+
+        class InterruptedHandle:
+            """Plays the first sentence, then reports a barge-in."""
+            interrupted = True
+
+            def __init__(self, source):
+                self._source = source
+
+            def __await__(self):
+                return self._play().__await__()
+
+            async def _play(self):
+                async for _ in self._source:
+                    break
+
+        agent_session = MagicMock()
+        agent_session.llm.chat = AsyncMock(side_effect=lambda **kwargs: llm_stream())
+        agent_session.say = InterruptedHandle
+        user_data = UserData(agent_session=agent_session)
+
+        agent = DesignStrategistAgent()
+        items = [ChatMessage(role="user", content=["An interrupted question"])]
+        original_user_data = type(agent).user_data
+        type(agent).user_data = property(lambda self: user_data)
+        try:
+            reply, complete = asyncio.run(agent._speak_llm_reply(items))
+        finally:
+            type(agent).user_data = original_user_data
+
+        assert reply == "First sentence."
+        assert not complete
+        assert agent._reply_cache_key(items) not in _REPLY_CACHE
+
+    def test_refine_problem_statement_falls_back_on_stream_error(self):
+        """Test that an LLM error mid-stream reaches the tool, which falls back without repeating the prefix."""
+        import asyncio
+        from types import SimpleNamespace
+
+        async def failing_stream():
+            yield SimpleNamespace(delta=SimpleNamespace(content="Partial"))
+            raise RuntimeError("stream dropped")
+
+        spoken = []
+
+        class PlayedHandle:
+            """Plays the whole source, recording what reached TTS."""
+            interrupted = False
+
+            def __init__(self, source):
+                self._source = source
+
+            def __await__(self):
+                return self._play().__await__()
+
+            async def _play(self):
+                if isinstance(self._source, str):
+                    spoken.append(self._source)
+                else:
+                    spoken.append("".join([text async for text in self._source]))
+
+        agent_session = MagicMock()
+        agent_session.llm.chat = AsyncMock(side_effect=lambda **kwargs: failing_stream())
+        agent_session.say = PlayedHandle
+        user_data = UserData(
+            agent_session=agent_session,
+            db=MagicMock(),
+            first_name=TEST_USER['first_name'],
+            last_name=TEST_USER['last_name'],
+            design_challenge=TEST_DESIGN_CHALLENGE['design_challenge'],
+        )
+
+        async def refine():
+            result = await agent.refine_problem_statement(TEST_PROBLEM_STATEMENT)
+            await user_data.flush_pending_save()
+            return result
+
+        agent = DesignStrategistAgent()
+        original_user_data = type(agent).user_data
+        type(agent).user_data = property(lambda self: user_data)
+        try:
+            result = asyncio.run(refine())
+        finally:
+            type(agent).user_data = original_user_data
+
+        assert result == "Problem statement refined."
+        assert spoken.count("Problem statement updated.") == 1
+        assert spoken[-1] == "Now, what's the first step we should take to solve this?"
+
+    def test_propose_solutions_batch_parses_string_indices(self):
+        """Test that 1-based string indices map to the right candidates and every candidate is stored."""
+        import asyncio
+        from types import SimpleNamespace
+
+        reply = '[{"idx": "1", "critique": "Too broad.", "score": "4"}, {"idx": "2", "critique": "Focused.", "score": 8}]'
+
+        async def llm_stream():
+            yield SimpleNamespace(delta=SimpleNamespace(content=reply))
+
+        spoken = []
+
+        async def played():
+            pass
+
+        def say(text):
+            spoken.append(text)
+            return played()
+
+        agent_session = MagicMock()
+        agent_session.llm.chat = AsyncMock(side_effect=lambda **kwargs: llm_stream())
+        agent_session.say = say
+        user_data = UserData(agent_session=agent_session, db=MagicMock(),
+                             design_challenge=TEST_DESIGN_CHALLENGE['design_challenge'])
+
+        async def run():
+            result = await agent.propose_solutions_batch(["Option A", "Option B"])
+            await user_data.flush_pending_save()
+            return result
+
+        agent = DesignStrategistAgent()
+        original_user_data = type(agent).user_data
+        type(agent).user_data = property(lambda self: user_data)
+        try:
+            asyncio.run(run())
+        finally:
+            type(agent).user_data = original_user_data
+
+        assert [i["critique"] for i in user_data.design_iterations] == ["Too broad.", "Focused."]
+        # No refined statement yet, so the challenge is stored as the problem statement
+        assert all(i["problem_statement"] == TEST_DESIGN_CHALLENGE['design_challenge']
+                   for i in user_data.design_iterations)
+        assert "option 2: Option B. Focused." in spoken[-1]
+
+    def test_agent_state_follows_pending_transcripts(self):
+        """Test that a state packet is published after transcripts already enqueued."""
+        import asyncio
+        from design_assistant.agents.base_agent import _TranscriptPublisher
+
+        participant = MagicMock()
+        participant.publish_data = AsyncMock()
+
+        async def publish():
+            publisher = _TranscriptPublisher(participant)
+            publisher.enqueue('{"message":"last line"}')
+            await publisher.publish_in_order(b'{"type":"agent_state"}')
+
+        asyncio.run(publish())
+        payloads = [call.args[0] for call in participant.publish_data.await_args_list]
+        assert payloads == [b'{"message":"last line"}', b'{"type":"agent_state"}']
+
+    def test_transcript_batches_respect_byte_limit(self):
+        """Test that batches are split on UTF-8 bytes and keep message order."""
+        import asyncio
+        import json
+        from design_assistant.agents import base_agent
+
+        participant = MagicMock()
+        participant.publish_data = AsyncMock()
+        limit = 200
+        # Each message is under 60 characters but over 100 bytes once encoded
+        messages = [json.dumps({"message": f"{i}:" + "é" * 50}, ensure_ascii=False) for i in range(5)]
+        oversized = json.dumps({"message": "big:" + "x" * (limit * 2)})
+        messages.insert(2, oversized)
+
+        async def publish():
+            publisher = base_agent._TranscriptPublisher(participant)
+            await publisher._publish_pending(messages)
+
+        with patch.object(base_agent, "_MAX_BATCH_BYTES", limit):
+            asyncio.run(publish())
+
+        published = []
+        for call in participant.publish_data.await_args_list:
+            payload = call.args[0]
+            envelope = json.loads(payload)
+            batch = envelope["msgs"] if envelope.get("type") == "batch" else [envelope]
+            # Only a message that is too big on its own may exceed the limit
+            assert len(payload) <= limit or batch == [json.loads(oversized)]
+            published.extend(batch)
+
+        assert published == [json.loads(message) for message in messages]
+        assert participant.publish_data.await_count > 2
+
+    def test_filler_utterances_detected(self):
+        """Test that bare acknowledgements are recognised as filler."""
+        assert DesignCoachAgent._is_filler("Okay.")
+        assert DesignCoachAgent._is_filler(" Thank you! ")
+        assert not DesignCoachAgent._is_filler("Okay, the users are nurses.")
+        assert not DesignCoachAgent._is_filler("Yes.")
+        assert not DesignCoachAgent._is_filler("no")
+
+def _chat_history(labels: str) -> list:
+    """Build chat items from labels: s=system, u/a=user/assistant, e=empty, fc/fo=function call/output."""
+    from types import SimpleNamespace
+    from livekit.agents.llm import ChatMessage
+
+    items = []
+    for label in labels.split():
+        if label in ("fc", "fo"):
+            kind = "function_call" if label == "fc" else "function_call_output"
+            items.append(SimpleNamespace(type=kind, label=label))
+            continue
+        role = {"s": "system", "u": "user", "a": "assistant", "e": "user"}[label[0]]
+        message = ChatMessage(role=role, content=[] if label[0] == "e" else [label])
+        items.append(message)
+    return items
+
+def _labels(items: list) -> str:
+    return " ".join(getattr(item, "label", None) or item.content[0] for item in items)
+
+class TestTruncateChatCtx:
+    """Table-driven tests for BaseAgent._truncate_chat_ctx."""
+
+    @pytest.mark.parametrize("history, keep_last_n, keep_system, keep_function_call, expected", [
+        # keep_last_n boundaries
+        ("u1 a1 u2", 0, False, False, ""),
+        ("u1 a1 u2", 1, False, False, "u2"),
+        ("u1 a1 u2", 2, False, False, "a1 u2"),
+        ("u1 a1 u2", 3, False, False, "u1 a1 u2"),
+        ("u1 a1 u2", 10, False, False, "u1 a1 u2"),
+        ("u1 e1 a1 e2", 10, False, False, "u1 a1"),
+        ("", 6, False, False, ""),
+        # The system message is kept on top of the last N items
+        ("s1 u1 a1 u2", 2, True, False, "s1 a1 u2"),
+        ("s1 u1 a1 u2", 2, False, False, "a1 u2"),
+        ("s1 u1", 0, True, False, "s1"),
+        # A history that opens on a function call or its output
+        ("fc fo u1 a1", 10, False, True, "u1 a1"),
+        ("fc fo u1 a1", 10, False, False, "u1 a1"),
+        ("fo u1 a1", 10, False, True, "u1 a1"),
+        ("fo u1 a1", 10, False, False, "u1 a1"),
+        ("s1 fc fo u1", 3, True, True, "s1 u1"),
+        # A cut that lands on a function call drops it along with its output
+        ("u1 fc fo a1", 3, False, True, "a1"),
+        ("u1 fc fo a1", 3, False, False, "u1 a1"),
+        ("u1 fc fo a1", 4, False, True, "u1 fc fo a1"),
+    ])
+    def test_truncate_chat_ctx(self, history, keep_last_n, keep_system, keep_function_call, expected):
+        agent = DesignCoachAgent()
+        items = _chat_history(history)
+        original = list(items)
+
+        result = agent._truncate_chat_ctx(
+            items,
+            keep_last_n_messages=keep_last_n,
+            keep_system_message=keep_system,
+            keep_function_call=keep_function_call,
+        )
+
+        assert _labels(result) == expected
+        assert items == original  # the caller's list is not mutated
+
 class TestWorkflowIntegration:
     """Test the complete workflow integration."""
 
@@ -158,6 +522,57 @@ class TestWorkflowIntegration:
         next_agent, context = session.determine_next_agent("DesignEvaluatorAgent")
         assert next_agent == "DesignEvaluatorAgent"  # Stays on same agent
 
+    def test_agent_state_publishes_dedupe_while_in_flight(self):
+        """Test that overlapping state publishes send once and keep the newest key."""
+        import asyncio
+
+        ctx = MagicMock()
+        published = []
+
+        async def run():
+            gate = asyncio.Event()
+
+            async def publish_data(payload, topic):
+                published.append(payload)
+                if len(published) == 1:
+                    await gate.wait()
+
+            ctx.room.local_participant.publish_data = publish_data
+            user_data = UserData(ctx=ctx)
+            session = DesignSession(user_data)
+
+            # The same state twice while the first publish is still in flight
+            first = asyncio.create_task(session._send_agent_state())
+            await asyncio.sleep(0)
+            await session._send_agent_state()
+            assert len(published) == 1
+
+            # A newer state finishes before the older publish does
+            user_data.current_agent_name = "DesignStrategistAgent"
+            await session._send_agent_state()
+            gate.set()
+            await first
+            await session._send_agent_state()
+
+        asyncio.run(run())
+        assert len(published) == 2
+
+    def test_failed_agent_state_publish_is_retried(self):
+        """Test that a failed state publish does not suppress the same state later."""
+        import asyncio
+
+        ctx = MagicMock()
+        ctx.room.local_participant.publish_data = AsyncMock(side_effect=[ConnectionError("dropped"), None])
+        session = DesignSession(UserData(ctx=ctx))
+
+        async def run():
+            with pytest.raises(ConnectionError):
+                await session._send_agent_state()
+            await session._send_agent_state()
+
+        asyncio.run(run())
+        assert ctx.room.local_participant.publish_data.await_count == 2
+
     def test_import_compatibility(self):
         """Test that imports work from the old monolithic structure."""
         # Test backwards compatibility imports
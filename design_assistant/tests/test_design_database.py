@@ -26,18 +26,24 @@ Dependencies:
 import os
 import pytest
 
-# Skip these integration tests unless explicitly enabled. They require
-# valid Supabase credentials and network access.
-pytestmark = pytest.mark.skipif(
+# Skip the integration tests unless explicitly enabled. They require
+# valid Supabase credentials and network access. The unit tests at the end
+# of the module run against an in-memory fake client instead.
+requires_supabase = pytest.mark.skipif(
     os.getenv("RUN_SUPABASE_TESTS") != "1",
     reason="Set RUN_SUPABASE_TESTS=1 with valid Supabase env vars to run integration tests.",
 )
 
 import os
 import pytest
+import uuid
 from datetime import datetime
+from types import SimpleNamespace
 from typing import Dict, Any
+from unittest.mock import patch
 from dotenv import load_dotenv
+from postgrest.exceptions import APIError
+import design_assistant.design_database as design_database
 from design_assistant.design_database import DesignDatabase
 from design_assistant.user_data import UserData
 
@@ -232,6 +238,7 @@ def sample_user_data():
     user_data.emotional_goals = SAMPLE_SESSION["emotional_goals"]
     return user_data
 
+@requires_supabase
 def test_database_initialization():
     """
     Test database connection and initialization.
@@ -267,6 +274,7 @@ def test_database_initialization():
         if original_key:
             os.environ['SUPABASE_KEY'] = original_key
 
+@requires_supabase
 def test_save_user_data(db, sample_user_data):
     """
     Test saving UserData state to the database.
@@ -293,6 +301,7 @@ def test_save_user_data(db, sample_user_data):
     assert session["target_users"] == SAMPLE_SESSION["target_users"], "Target users should match"
     assert session["emotional_goals"] == SAMPLE_SESSION["emotional_goals"], "Emotional goals should match"
 
+@requires_supabase
 def test_load_user_data(db, sample_user_data):
     """
     Test loading UserData state from the database.
@@ -325,6 +334,7 @@ def test_load_user_data(db, sample_user_data):
     assert loaded_data.prev_agent is None, "Previous agent should be None"
     assert loaded_data.ctx is None, "Context should be None"
 
+@requires_supabase
 def test_get_or_create_user(db: DesignDatabase, test_user_data: Dict[str, Any]) -> None:
     """
     Test user creation and retrieval functionality.
@@ -352,6 +362,7 @@ def test_get_or_create_user(db: DesignDatabase, test_user_data: Dict[str, Any])
     )
     assert same_user_id == user_id
 
+@requires_supabase
 def test_create_design_session(db: DesignDatabase, test_user_data: Dict[str, Any], test_session_data: Dict[str, Any]) -> None:
     """
     Test design session creation functionality.
@@ -381,6 +392,7 @@ def test_create_design_session(db: DesignDatabase, test_user_data: Dict[str, Any
     )
     assert session_id is not None
 
+@requires_supabase
 def test_update_session(db: DesignDatabase, test_user_data: Dict[str, Any], test_session_data: Dict[str, Any]) -> None:
     """
     Test session update functionality.
@@ -415,6 +427,7 @@ def test_update_session(db: DesignDatabase, test_user_data: Dict[str, Any], test
     session = db.get_session_details(session_id)
     assert session["status"] == new_status
 
+@requires_supabase
 def test_add_design_iteration(db: DesignDatabase, test_user_data: Dict[str, Any], 
                             test_session_data: Dict[str, Any], test_iteration_data: Dict[str, Any]) -> None:
     """
@@ -451,6 +464,7 @@ def test_add_design_iteration(db: DesignDatabase, test_user_data: Dict[str, Any]
     )
     assert iteration_id is not None
 
+@requires_supabase
 def test_add_feedback(db: DesignDatabase, test_user_data: Dict[str, Any], 
                      test_session_data: Dict[str, Any], test_feedback_data: Dict[str, Any]) -> None:
     """
@@ -486,6 +500,7 @@ def test_add_feedback(db: DesignDatabase, test_user_data: Dict[str, Any],
     )
     assert feedback_id is not None
 
+@requires_supabase
 def test_get_user_sessions(db: DesignDatabase, test_user_data: Dict[str, Any], test_session_data: Dict[str, Any]) -> None:
     """
     Test user session retrieval functionality.
@@ -528,6 +543,7 @@ def test_get_user_sessions(db: DesignDatabase, test_user_data: Dict[str, Any], t
     assert session1_id in session_ids
     assert session2_id in session_ids
 
+@requires_supabase
 def test_get_session_details(db: DesignDatabase, test_user_data: Dict[str, Any], 
                            test_session_data: Dict[str, Any], test_iteration_data: Dict[str, Any],
                            test_feedback_data: Dict[str, Any]) -> None:
@@ -577,6 +593,7 @@ def test_get_session_details(db: DesignDatabase, test_user_data: Dict[str, Any],
     assert len(session["iterations"]) >= 1
     assert len(session["feedback"]) >= 1
 
+@requires_supabase
 def test_save_user_data_errors(db, sample_user_data):
     """
     Test error handling when saving user data.
@@ -602,6 +619,7 @@ def test_save_user_data_errors(db, sample_user_data):
     with pytest.raises(ValueError):
         sample_user_data.save_state()
 
+@requires_supabase
 def test_load_user_data_errors(db):
     """
     Test error handling when loading user data.
@@ -626,6 +644,7 @@ def test_load_user_data_errors(db):
     with pytest.raises(ValueError, match="Session not found"):
         user_data.load_state("00000000-0000-0000-0000-000000000000")
 
+@requires_supabase
 def test_session_management_errors(db):
     """
     Test error handling in session management operations.
@@ -654,6 +673,7 @@ def test_session_management_errors(db):
             feedback_data={"test": "test"}
         )
 
+@requires_supabase
 def test_data_validation_errors(db, sample_user_data):
     """
     Test data validation error handling.
@@ -699,6 +719,7 @@ def test_data_validation_errors(db, sample_user_data):
             feedback_data={}  # Empty feedback
         )
 
+@requires_supabase
 def test_concurrent_access_handling(db, sample_user_data):
     """
     Test handling of concurrent access scenarios.
@@ -730,6 +751,7 @@ def test_concurrent_access_handling(db, sample_user_data):
     loaded_data.load_state(session_id1)
     assert loaded_data.design_challenge == sample_user_data.design_challenge
 
+@requires_supabase
 def test_database_connection_errors():
     """
     Test handling of database connection errors.
@@ -749,4 +771,221 @@ def test_database_connection_errors():
     
     # Test connection timeout
     with pytest.raises(ValueError):
-        DesignDatabase(supabase_url="http://invalid-host", supabase_key="valid_key") 
\ No newline at end of file
+        DesignDatabase(supabase_url="http://invalid-host", supabase_key="valid_key") 
+
+# --- Unit tests against an in-memory Supabase stand-in ---
+
+class _FakeQuery:
+    """One client.table(...) chain, executed against _FakeSupabase's tables."""
+
+    def __init__(self, store: "_FakeSupabase", table: str):
+        self._store = store
+        self._table = table
+        self._op = "select"
+        self._payload = None
+        self._filters = []
+        self._single = False
+
+    def select(self, *columns):
+        self._op = "select"
+        return self
+
+    def insert(self, rows):
+        self._op, self._payload = "insert", rows
+        return self
+
+    def update(self, values):
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self._filters.append((column, value))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def execute(self):
+        self._store.requests.append((self._table, self._op))
+        rows = self._store.tables[self._table]
+        matches = [row for row in rows if all(row.get(c) == v for c, v in self._filters)]
+        if self._op == "insert":
+            new_rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            data = [self._store.insert_row(self._table, dict(row)) for row in new_rows]
+        elif self._op == "update":
+            for row in matches:
+                row.update(self._payload)
+            data = [dict(row) for row in matches]
+        elif self._op == "delete":
+            for row in matches:
+                rows.remove(row)
+            data = matches
+        else:
+            data = [dict(row) for row in matches]
+        if self._single:
+            data = data[0] if data else None
+        return SimpleNamespace(data=data)
+
+class _FakeSupabase:
+    """In-memory Supabase client: four tables, the sessions->users foreign key and cleanup_all()."""
+
+    def __init__(self):
+        self.tables = {name: [] for name in ("users", "design_sessions", "design_iterations", "feedback_history")}
+        self.requests = []
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self, name)
+
+    def rpc(self, name: str, params=None):
+        assert name == "cleanup_all"
+        return SimpleNamespace(execute=self.wipe)
+
+    def wipe(self):
+        for rows in self.tables.values():
+            rows.clear()
+
+    def insert_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        if table == "design_sessions" and not any(u["id"] == row["user_id"] for u in self.tables["users"]):
+            raise APIError({"message": "insert violates foreign key constraint", "code": "23503"})
+        row["id"] = str(uuid.uuid4())
+        self.tables[table].append(row)
+        return dict(row)
+
+    def count(self, table: str, op: str) -> int:
+        return self.requests.count((table, op))
+
+@pytest.fixture
+def fake_client() -> _FakeSupabase:
+    """The in-memory client behind fake_db."""
+    return _FakeSupabase()
+
+@pytest.fixture
+def fake_db(fake_client: _FakeSupabase) -> DesignDatabase:
+    """A DesignDatabase wired to the in-memory client."""
+    with patch.object(design_database, "create_client", return_value=fake_client):
+        return DesignDatabase(supabase_url="https://example.supabase.co", supabase_key="test-key")
+
+@pytest.fixture
+def populated_user_data(sample_user_data) -> UserData:
+    """sample_user_data with two iterations and one feedback entry."""
+    sample_user_data.design_iterations = [
+        {"problem_statement": "Problem 1", "solution": "Solution 1"},
+        {"problem_statement": "Problem 2", "solution": "Solution 2"},
+    ]
+    sample_user_data.feedback_history = [dict(SAMPLE_FEEDBACK)]
+    return sample_user_data
+
+def _new_session(db: DesignDatabase) -> str:
+    user_id, _ = db.get_or_create_user(SAMPLE_USER["first_name"], SAMPLE_USER["last_name"])
+    return db.create_design_session(user_id, "Challenge", [], [], "awaiting_problem_definition")
+
+def test_add_design_iterations_returns_ids_in_order(fake_db, fake_client):
+    session_id = _new_session(fake_db)
+
+    ids = fake_db.add_design_iterations(session_id, [("P1", "S1"), ("P2", "S2"), ("P3", "S3")])
+
+    rows = fake_client.tables["design_iterations"]
+    assert ids == [row["id"] for row in rows]
+    assert [row["solution"] for row in rows] == ["S1", "S2", "S3"]
+    assert fake_client.count("design_iterations", "insert") == 1
+
+def test_add_feedback_entries_returns_ids_in_order(fake_db, fake_client):
+    session_id = _new_session(fake_db)
+
+    ids = fake_db.add_feedback_entries(session_id, [{"feedback": "a"}, {"feedback": "b"}])
+
+    rows = fake_client.tables["feedback_history"]
+    assert ids == [row["id"] for row in rows]
+    assert [row["feedback_data"] for row in rows] == [{"feedback": "a"}, {"feedback": "b"}]
+    assert fake_client.count("feedback_history", "insert") == 1
+
+def test_save_user_data_tags_entries_with_row_ids(fake_db, fake_client, populated_user_data):
+    fake_db.save_user_data(populated_user_data)
+
+    iteration_rows = fake_client.tables["design_iterations"]
+    feedback_rows = fake_client.tables["feedback_history"]
+    assert [i["id"] for i in populated_user_data.design_iterations] == [row["id"] for row in iteration_rows]
+    assert populated_user_data.feedback_history[0]["id"] == feedback_rows[0]["id"]
+    # The row id is not part of the stored payload
+    assert feedback_rows[0]["feedback_data"] == SAMPLE_FEEDBACK
+    assert populated_user_data.user_id == fake_client.tables["users"][0]["id"]
+
+def test_second_save_inserts_nothing(fake_db, fake_client, populated_user_data):
+    fake_db.save_user_data(populated_user_data)
+    requests_after_first_save = len(fake_client.requests)
+
+    fake_db.save_user_data(populated_user_data)
+
+    second_save = fake_client.requests[requests_after_first_save:]
+    assert ("design_iterations", "insert") not in second_save
+    assert ("feedback_history", "insert") not in second_save
+    # Stored row ids are answered from memory, without re-reading the tables
+    assert ("design_iterations", "select") not in second_save
+    assert len(fake_client.tables["design_iterations"]) == 2
+    assert len(fake_client.tables["feedback_history"]) == 1
+
+def test_saving_a_loaded_session_inserts_nothing(fake_db, fake_client, populated_user_data):
+    session_id = fake_db.save_user_data(populated_user_data)
+
+    loaded = fake_db.load_user_data(session_id)
+    fake_db.save_user_data(loaded)
+
+    assert len(fake_client.tables["design_iterations"]) == 2
+    assert [row["feedback_data"] for row in fake_client.tables["feedback_history"]] == [SAMPLE_FEEDBACK]
+
+def test_cleanup_all_clears_caches(fake_db, fake_client, populated_user_data):
+    fake_db.save_user_data(populated_user_data)
+
+    fake_db.cleanup_all()
+
+    assert not fake_db._user_ids
+    assert not fake_db._saved_iterations
+    assert not fake_db._saved_feedback
+    assert all(not rows for rows in fake_client.tables.values())
+
+    # Entries tagged with ids of deleted rows are written again
+    fake_db.save_user_data(populated_user_data)
+    assert len(fake_client.tables["design_iterations"]) == 2
+    assert [i["id"] for i in populated_user_data.design_iterations] == [
+        row["id"] for row in fake_client.tables["design_iterations"]
+    ]
+
+def test_user_id_lru(fake_db, fake_client):
+    with patch.object(design_database, "_USER_ID_CACHE_SIZE", 2):
+        first_id, created = fake_db.get_or_create_user("Ada", "Lovelace")
+        assert created
+        fake_db.get_or_create_user("Alan", "Turing")
+        lookups = fake_client.count("users", "select")
+
+        # A remembered name is answered without a query
+        assert fake_db.get_or_create_user("Ada", "Lovelace") == (first_id, False)
+        assert fake_client.count("users", "select") == lookups
+
+        # A third name evicts the least recently used one (Turing)
+        fake_db.get_or_create_user("Grace", "Hopper")
+        lookups = fake_client.count("users", "select")
+        fake_db.get_or_create_user("Alan", "Turing")
+        assert fake_client.count("users", "select") == lookups + 1
+        assert len(fake_db._user_ids) == 2
+
+def test_stale_cached_user_id_is_resolved_again(fake_db, fake_client, populated_user_data):
+    fake_db.save_user_data(populated_user_data)
+    stale_user_id = populated_user_data.user_id
+
+    # Another process empties the tables behind this instance's caches
+    fake_client.wipe()
+    fake_db.save_user_data(populated_user_data)
+
+    new_user_id = fake_client.tables["users"][0]["id"]
+    assert new_user_id != stale_user_id
+    assert populated_user_data.user_id == new_user_id
+    assert fake_client.tables["design_sessions"][0]["user_id"] == new_user_id
+    assert len(fake_client.tables["design_iterations"]) == 2
@@ -7,8 +7,11 @@ the state of a user's design session and store the final structured output.
 Extracted from design_assistant.py as part of the backend refactoring.
 """
 
-from dataclasses import dataclass, field
-from typing import Optional
+import asyncio
+import copy
+import logging
+from dataclasses import dataclass, field, fields
+from typing import Any, Optional
 
 from livekit.agents import JobContext
 from livekit.agents.voice import Agent, AgentSession
@@ -16,7 +19,19 @@ from livekit.agents.voice import Agent, AgentSession
 # Forward declaration for type hints - will need to import DesignDatabase
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from design_database import DesignDatabase
+    from livekit import rtc
+    from design_database import DesignDatabase, SaveResult
+
+logger = logging.getLogger(__name__)
+
+# Saves requested within this window are written to the database once
+_SAVE_DEBOUNCE_SECONDS = 0.1
+
+# Fields that feed is_identified() / summarize(); writing one drops the cached result
+_IDENTITY_FIELDS = frozenset({'first_name', 'last_name', 'user_id', 'db'})
+_SUMMARY_FIELDS = _IDENTITY_FIELDS | {
+    'design_challenge', 'target_users', 'emotional_goals', 'problem_statement', 'proposed_solution',
+}
 
 @dataclass
 class ClarityCapsule:
@@ -27,7 +42,7 @@ class ClarityCapsule:
     blind_spots: list[str]
     next_steps: list[str]
 
-@dataclass
+@dataclass(slots=True)
 class UserData:
     '''
     Manages the state for a user's design session, including all data,
@@ -36,8 +51,14 @@ class UserData:
 
     Attributes:
         personas (dict[str, Agent]): Holds all agent instances for the session.
+        agent_identities (set[str]): Persona keys and agent names, used to tell agents
+                                     apart from the human participant.
         prev_agent (Optional[Agent]): The previously active agent, used for context transfer.
         ctx (Optional[JobContext]): The LiveKit job context.
+        user_participant (Optional[rtc.Participant]): Cached human participant used to
+                                                      attribute user transcripts.
+        transcript_publisher (Optional[Any]): Session-wide publisher that coalesces
+                                              transcript data packets.
         agent_session (Optional[AgentSession]): The active agent session.
 
         first_name (Optional[str]): The user's first name.
@@ -61,8 +82,11 @@ class UserData:
     '''
     # Agent Management
     personas: dict[str, Agent] = field(default_factory=dict)
+    agent_identities: set[str] = field(default_factory=set, repr=False)
     prev_agent: Optional[Agent] = None
     ctx: Optional[JobContext] = None
+    user_participant: Optional["rtc.Participant"] = field(default=None, repr=False)
+    transcript_publisher: Optional[Any] = field(default=None, repr=False)
 
     # User Identification
     first_name: Optional[str] = None
@@ -97,6 +121,25 @@ class UserData:
         'doc': 'Database connection for state persistence. Set during initialization.'
     })
     agent_session: Optional[AgentSession] = None
+    # Back-reference set by DesignSession.initialize(); declared because slots leave no __dict__
+    design_session: Optional[Any] = field(default=None, repr=False, compare=False)
+
+    # Memoized results of is_identified() and summarize(), cleared in __setattr__
+    _identified_cache: Optional[bool] = field(default=None, init=False, repr=False, compare=False)
+    _summary_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    # Background writer state for mark_dirty()
+    _save_task: Optional[asyncio.Task] = field(default=None, init=False, repr=False, compare=False)
+    _save_requested: bool = field(default=False, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value) -> None:
+        # object.__setattr__ rather than super(): slots=True rebuilds the class,
+        # which breaks the zero-argument super() cell
+        object.__setattr__(self, name, value)
+        if name in _SUMMARY_FIELDS:
+            object.__setattr__(self, '_summary_cache', None)
+            if name in _IDENTITY_FIELDS:
+                object.__setattr__(self, '_identified_cache', None)
 
     def is_identified(self) -> bool:
         '''
@@ -105,10 +148,16 @@ class UserData:
         This method first checks for a first and last name in the current session's
         memory. If not found, it will check if a user_id exists and is valid in the
         database. This allows for identifying returning users who have persisted sessions.
+        The result is cached until one of those fields is assigned.
         
         Returns:
             bool: True if the user is identified, False otherwise.
         '''
+        if self._identified_cache is None:
+            self._identified_cache = self._check_identified()
+        return self._identified_cache
+
+    def _check_identified(self) -> bool:
         if self.first_name and self.last_name:
             return True
         if self.user_id and self.db:
@@ -149,15 +198,15 @@ class UserData:
         self.problem_statement = None
         self.proposed_solution = None
         self.status = "awaiting_problem_definition"
-        self.design_iterations = []
-        self.feedback_history = []
+        self.design_iterations.clear()
+        self.feedback_history.clear()
         self.clarity_capsule = None
 
         # Reset orchestration state
         self.current_agent_name = "DesignCoachAgent"
-        self.agent_sequence = []
+        self.agent_sequence.clear()
         self.loop_reason = None
-        self.loop_counts = {}
+        self.loop_counts.clear()
 
     def summarize(self) -> str:
         '''
@@ -174,7 +223,15 @@ class UserData:
         Future Improvements:
         - Rich formatting
         - Customization options
+
+        Note:
+            The result is cached until a field it depends on is assigned.
         '''
+        if self._summary_cache is None:
+            self._summary_cache = self._build_summary()
+        return self._summary_cache
+
+    def _build_summary(self) -> str:
         summary_parts = []
         if self.is_identified():
             summary_parts.append(f"User: {self.first_name} {self.last_name} (ID: {self.user_id})")
@@ -227,6 +284,80 @@ class UserData:
             raise ValueError("No database configured. Set UserData.db before saving.")
         return self.db.save_user_data(self)
 
+    def apply_save_result(
+        self,
+        result: "SaveResult",
+        iterations: Optional[list[dict]] = None,
+        feedback: Optional[list[dict]] = None,
+    ) -> None:
+        '''
+        Record what a database write stored: the user ID, and the row ID of
+        each newly inserted iteration and feedback entry.
+
+        Args:
+            result (SaveResult): The result returned by DesignDatabase.write_user_data.
+            iterations (Optional[list[dict]]): The design_iterations entries that were
+                                               written, in order. Defaults to the current list.
+            feedback (Optional[list[dict]]): The feedback_history entries that were
+                                             written, in order. Defaults to the current list.
+        '''
+        if iterations is None:
+            iterations = self.design_iterations
+        if feedback is None:
+            feedback = self.feedback_history
+        if self.user_id != result.user_id:
+            self.user_id = result.user_id
+        for index, row_id in result.iteration_ids.items():
+            iterations[index]['id'] = row_id
+        for index, row_id in result.feedback_ids.items():
+            feedback[index]['id'] = row_id
+
+    def mark_dirty(self) -> None:
+        '''
+        Request a save_state() without waiting for it.
+
+        The write runs in a background task on a worker thread, so function
+        tools can return to the LLM without blocking on Supabase. The thread
+        is given a snapshot of the session, and the IDs it stores are applied
+        back on the event loop. Requests made while a save is pending or in
+        flight are coalesced into one follow-up write. Failures are logged
+        rather than raised.
+        '''
+        self._save_requested = True
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._save_in_background())
+
+    async def flush_pending_save(self) -> None:
+        '''Wait for any save requested through mark_dirty() to reach the database.'''
+        if self._save_task is not None:
+            await asyncio.shield(self._save_task)
+
+    async def _save_in_background(self) -> None:
+        try:
+            while self._save_requested:
+                await asyncio.sleep(_SAVE_DEBOUNCE_SECONDS)
+                self._save_requested = False
+                try:
+                    await self._write_snapshot()
+                except Exception as e:
+                    logger.error(f"Background save failed: {e}")
+        finally:
+            self._save_task = None
+
+    async def _write_snapshot(self) -> None:
+        if not self.db:
+            raise ValueError("No database configured. Set UserData.db before saving.")
+        # Captured on the loop thread, in the same order as the snapshot's copies
+        iterations = list(self.design_iterations)
+        feedback = list(self.feedback_history)
+        snapshot = self._snapshot()
+        result = await asyncio.to_thread(self.db.write_user_data, snapshot)
+        self.apply_save_result(result, iterations, feedback)
+
+    def _snapshot(self) -> "UserData":
+        '''Deep-copy the stored fields, so another thread can read them while this instance changes.'''
+        return UserData(**{name: copy.deepcopy(getattr(self, name)) for name in _LOAD_FIELDS})
+
     def load_state(self, session_id: str) -> None:
         '''
         Load state from the database.
@@ -254,7 +385,8 @@ class UserData:
             2. Load session state
             3. Load all design iterations
             4. Load all feedback history
-            5. Preserve agent-related fields (personas, prev_agent, ctx)
+            5. Preserve agent-related fields (personas, agent_identities, prev_agent, ctx,
+               user_participant, transcript_publisher)
         '''
         if not self.db:
             raise ValueError("No database configured. Set UserData.db before loading.")
@@ -263,7 +395,16 @@ class UserData:
         loaded_data = self.db.load_user_data(session_id)
         
         # Update all fields except db and agent-related fields
-        for field_info in self.__dataclass_fields__:
-            field_name = field_info.name
-            if field_name not in ['db', 'personas', 'prev_agent', 'ctx', 'agent_session']:
-                setattr(self, field_name, getattr(loaded_data, field_name)) 
\ No newline at end of file
+        for field_name in _LOAD_FIELDS:
+            setattr(self, field_name, getattr(loaded_data, field_name)) 
+
+# Fields that belong to the live session rather than the stored one
+_RUNTIME_FIELDS = frozenset({
+    'db', 'personas', 'agent_identities', 'prev_agent', 'ctx', 'user_participant',
+    'transcript_publisher', 'agent_session', 'design_session',
+})
+# Fields load_state() copies from a loaded session, resolved once; init=False
+# fields are the instance's own caches and background-save state
+_LOAD_FIELDS = tuple(
+    f.name for f in fields(UserData) if f.init and f.name not in _RUNTIME_FIELDS
+)
@@ -34,7 +34,9 @@ function LiveSessionContent({ onDisconnect }: { onDisconnect: () => void }) {
   const [clarityCapsule, setClarityCapsule] = useState<ClarityCapsule | null>(null);
   
   useDataChannel(room, (msg: { payload: Uint8Array }) => {
-    const json = JSON.parse(new TextDecoder().decode(msg.payload));
+    const text = new TextDecoder().decode(msg.payload);
+    if (!text.includes('"clarity_capsule"')) return;
+    const json = JSON.parse(text);
     if (json.type === 'clarity_capsule') {
       setClarityCapsule(json);
     }
@@ -30,6 +30,8 @@ export const useAgentState = () => {
       if (topic !== 'lk-chat-topic') return;
       try {
         const jsonStr = new TextDecoder().decode(payload);
+        // Most packets on this topic are transcripts; only parse state updates
+        if (!jsonStr.includes('"agent_state"')) return;
         const data = JSON.parse(jsonStr);
         if (data?.type === 'agent_state') {
           const nextState: AgentState = {
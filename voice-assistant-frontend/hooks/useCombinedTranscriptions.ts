@@ -10,6 +10,36 @@ export interface CustomChatMessage {
   timestamp: number;
 }
 
+const appendChatMessage = (
+  currentMessages: CustomChatMessage[],
+  msg: any
+): CustomChatMessage[] => {
+  const lastMessage = currentMessages[currentMessages.length - 1];
+
+  if (
+    !msg.is_final &&
+    lastMessage &&
+    lastMessage.from?.identity === msg.from.identity &&
+    !lastMessage.id.startsWith("final-")
+  ) {
+    return currentMessages.map((m, i) =>
+      i === currentMessages.length - 1
+        ? { ...m, message: m.message + msg.message }
+        : m
+    );
+  } else {
+    return [
+      ...currentMessages,
+      {
+        id: msg.is_final ? `final-${nanoid()}` : `interim-${nanoid()}`,
+        from: msg.from as ChatFrom | undefined,
+        message: msg.message,
+        timestamp: msg.timestamp,
+      },
+    ];
+  }
+};
+
 export const useCombinedTranscriptions = () => {
   const [chatMessages, setChatMessages] = useState<CustomChatMessage[]>([]);
 
@@ -17,43 +47,27 @@ export const useCombinedTranscriptions = () => {
     const decoder = new TextDecoder();
     const rawMsg = decoder.decode(packet.payload);
     try {
-      const msg = JSON.parse(rawMsg);
+      const parsed = JSON.parse(rawMsg);
 
-      if (msg.type === "context" || msg.type === "agent_state" || msg.type === "clarity_capsule") {
-        return;
-      }
+      // The agent coalesces transcript chunks sent close together into one batch
+      const msgs: any[] = parsed.type === "batch" ? parsed.msgs : [parsed];
 
-      // Skip empty messages
-      if (!msg.message || msg.message.trim() === "") {
+      const chatMsgs = msgs.filter(
+        (msg) =>
+          msg.type !== "context" &&
+          msg.type !== "agent_state" &&
+          msg.type !== "clarity_capsule" &&
+          // Skip empty messages
+          msg.message &&
+          msg.message.trim() !== ""
+      );
+      if (chatMsgs.length === 0) {
         return;
       }
 
-      setChatMessages((currentMessages) => {
-        const lastMessage = currentMessages[currentMessages.length - 1];
-
-        if (
-          !msg.is_final &&
-          lastMessage &&
-          lastMessage.from?.identity === msg.from.identity &&
-          !lastMessage.id.startsWith("final-")
-        ) {
-          return currentMessages.map((m, i) =>
-            i === currentMessages.length - 1
-              ? { ...m, message: m.message + msg.message }
-              : m
-          );
-        } else {
-          return [
-            ...currentMessages,
-            {
-              id: msg.is_final ? `final-${nanoid()}` : `interim-${nanoid()}`,
-              from: msg.from as ChatFrom | undefined,
-              message: msg.message,
-              timestamp: msg.timestamp,
-            },
-          ];
-        }
-      });
+      setChatMessages((currentMessages) =>
+        chatMsgs.reduce(appendChatMessage, currentMessages)
+      );
     } catch (e) {
       console.error("Failed to parse chat message:", rawMsg, e);
     }